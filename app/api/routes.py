@@ -1,8 +1,15 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
+from collections import OrderedDict
+from typing import Annotated, Any, Set, Tuple
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ConfigDict, StringConstraints
+import asyncio
+import orjson
 import os
 
-from app.core.gynecology_session import GynecologySession
+from app.config.settings import OLLAMA_BASE_URL
+from app.core.gynecology_session import GynecologySession, SessionStatus
 from app.core.pregnancy_session import PregnancySession
 
 SESSIONS_DIR = "data/sessions"
@@ -10,27 +17,115 @@ SESSIONS_DIR = "data/sessions"
 router = APIRouter(prefix="/api", tags=["medical-ai"])
 
 
+# -----------------------------
+# Session cache
+# -----------------------------
+# Hot sessions stay in memory between messages; the JSON file is written in
+# the background. Each entry carries a lock so concurrent messages to the
+# same session are applied one at a time.
+SESSION_CACHE_SIZE = 1024
+SESSION_CACHE: "OrderedDict[Tuple[str, str], Tuple[Any, asyncio.Lock]]" = OrderedDict()
+_background_tasks: Set[asyncio.Task] = set()
+
+
+def _session_path(session_id: str) -> str:
+    return os.path.join(SESSIONS_DIR, f"{session_id}.json")
+
+
+def _store_entry(key: Tuple[str, str], entry: Tuple[Any, asyncio.Lock]) -> None:
+    SESSION_CACHE[key] = entry
+    SESSION_CACHE.move_to_end(key)
+    while len(SESSION_CACHE) > SESSION_CACHE_SIZE:
+        SESSION_CACHE.popitem(last=False)
+
+
+def _cache_session(session: Any) -> asyncio.Lock:
+    lock = asyncio.Lock()
+    _store_entry((type(session).__name__, session.session_id), (session, lock))
+    return lock
+
+
+async def _get_session(cls: Any, session_id: str, not_found: str) -> Tuple[Any, asyncio.Lock]:
+    key = (cls.__name__, session_id)
+    entry = SESSION_CACHE.get(key)
+    if entry is None:
+        try:
+            session = await asyncio.to_thread(
+                cls.load_from_file, _session_path(session_id), OLLAMA_BASE_URL
+            )
+        except FileNotFoundError:
+            raise HTTPException(404, not_found)
+        # another request may have loaded the same session while we were reading
+        entry = SESSION_CACHE.get(key) or (session, asyncio.Lock())
+    _store_entry(key, entry)
+    return entry
+
+
+def _spawn(coro: Any) -> None:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+def _persist_in_background(session: Any, lock: asyncio.Lock) -> None:
+    async def _persist() -> None:
+        async with lock:
+            await asyncio.to_thread(session.save_to_file, _session_path(session.session_id))
+
+    _spawn(_persist())
+
+
+def _condense_in_background(session: PregnancySession, lock: asyncio.Lock, client: Any) -> None:
+    # runs after the response is sent; the lock queues the next message behind it
+    async def _condense() -> None:
+        async with lock:
+            if await session.acondense_if_needed(client):
+                await asyncio.to_thread(session.save_to_file, _session_path(session.session_id))
+
+    _spawn(_condense())
+
+
+def _sse(data: Any) -> str:
+    return f"data: {orjson.dumps(data).decode('utf-8')}\n\n"
+
+
 # -----------------------------
 # Schemas
 # -----------------------------
+# session ids become file names, so keep them to a safe character set
+SessionId = Annotated[
+    str, StringConstraints(strip_whitespace=True, pattern=r"^[A-Za-z0-9_-]{1,64}$")
+]
+# long enough for any patient answer, short enough to keep out of the prompt otherwise
+MessageText = Annotated[
+    str, StringConstraints(strip_whitespace=True, min_length=1, max_length=4096)
+]
+
+
 class CreateSessionRequest(BaseModel):
-    session_id: str
+    model_config = ConfigDict(extra="forbid")
+
+    session_id: SessionId
 
 
 class MessageRequest(BaseModel):
-    message: str
+    model_config = ConfigDict(extra="forbid")
+
+    message: MessageText
 
 
 # -----------------------------
 # Gynecology routes
 # -----------------------------
 @router.post("/gynecology/start")
-def start_gynecology(req: CreateSessionRequest):
-    session = GynecologySession(req.session_id)
+async def start_gynecology(req: CreateSessionRequest, request: Request):
+    session = GynecologySession(
+        req.session_id, ollama_base_url=OLLAMA_BASE_URL, start_conversation=False
+    )
+    await session.ainitialize_conversation(request.app.state.http)
 
-    os.makedirs(SESSIONS_DIR, exist_ok=True)
-    path = os.path.join(SESSIONS_DIR, f"{req.session_id}.json")
-    session.save_to_file(path)
+    await asyncio.to_thread(session.save_to_file, _session_path(req.session_id))
+    _cache_session(session)
 
     return {
         "session_id": req.session_id,
@@ -39,39 +134,60 @@ def start_gynecology(req: CreateSessionRequest):
 
 
 @router.post("/gynecology/{session_id}/message")
-def gynecology_message(session_id: str, req: MessageRequest):
-    path = os.path.join(SESSIONS_DIR, f"{session_id}.json")
-    if not os.path.exists(path):
-        raise HTTPException(404, "Session not found")
-
-    session = GynecologySession.load_from_file(path)
-    reply = session.submit_answer("free_text", req.message)
-    session.save_to_file(path)
-
-    return {
-        "reply": reply,
-        "pregnancy_suspicion": session.pregnancy_suspicion
-    }
+async def gynecology_message(session_id: str, req: MessageRequest, request: Request):
+    session, lock = await _get_session(GynecologySession, session_id, "Session not found")
+    # checked before the 200 starts streaming, so the client gets a real status code
+    if session.status != SessionStatus.ACTIVE:
+        raise HTTPException(409, f"Session is not active. Status: {session.status.value}")
+    client = request.app.state.http
+
+    async def _events():
+        async with lock:
+            # a message queued behind this lock may have ended the session meanwhile
+            if session.status != SessionStatus.ACTIVE:
+                yield _sse({"error": f"Session is not active. Status: {session.status.value}"})
+                return
+
+            parts = []
+            stream = session.astream_answer(client, "free_text", req.message)
+            try:
+                async for chunk in stream:
+                    parts.append(chunk)
+                    yield _sse({"content": chunk})
+            finally:
+                # on disconnect too: record the (partial) reply and save the turn
+                await stream.aclose()
+                _persist_in_background(session, lock)
+
+        yield _sse({
+            "done": True,
+            "reply": "".join(parts).strip() or None,
+            "pregnancy_suspicion": session.pregnancy_suspicion
+        })
+
+    return StreamingResponse(_events(), media_type="text/event-stream")
 
 
 # -----------------------------
 # Transfer to pregnancy
 # -----------------------------
 @router.post("/gynecology/{session_id}/transfer")
-def transfer_to_pregnancy(session_id: str):
-    gyn_path = os.path.join(SESSIONS_DIR, f"{session_id}.json")
-    if not os.path.exists(gyn_path):
-        raise HTTPException(404, "Gynecology session not found")
-
-    pregnancy_session = PregnancySession.from_gynecology_session(
-        gyn_path,
-        ollama_base_url="http://localhost:11434"
+async def transfer_to_pregnancy(session_id: str, request: Request):
+    # build from the cached session: its latest answers may not be on disk yet
+    gyn_session, gyn_lock = await _get_session(
+        GynecologySession, session_id, "Gynecology session not found"
     )
-
-    pregnancy_path = os.path.join(SESSIONS_DIR, f"{pregnancy_session.session_id}.json")
-    pregnancy_session.save_to_file(pregnancy_path)
-
-    first_q = pregnancy_session.start()
+    async with gyn_lock:
+        pregnancy_session = PregnancySession(
+            f"pregnancy_{session_id}",
+            gynecology_session_data=gyn_session.to_dict(),
+            ollama_base_url=OLLAMA_BASE_URL
+        )
+
+    lock = _cache_session(pregnancy_session)
+    async with lock:
+        first_q = await pregnancy_session.astart(request.app.state.http)
+        _persist_in_background(pregnancy_session, lock)
 
     return {
         "pregnancy_session_id": pregnancy_session.session_id,
@@ -83,14 +199,13 @@ def transfer_to_pregnancy(session_id: str):
 # Pregnancy routes
 # -----------------------------
 @router.post("/pregnancy/{session_id}/message")
-def pregnancy_message(session_id: str, req: MessageRequest):
-    path = os.path.join(SESSIONS_DIR, f"{session_id}.json")
-    if not os.path.exists(path):
-        raise HTTPException(404, "Pregnancy session not found")
-
-    session = PregnancySession.load_from_file(path)
-    reply = session.submit_answer(req.message)
-    session.save_to_file(path)
+async def pregnancy_message(session_id: str, req: MessageRequest, request: Request):
+    session, lock = await _get_session(PregnancySession, session_id, "Pregnancy session not found")
+    client = request.app.state.http
+    async with lock:
+        reply = await session.asubmit_answer(client, req.message)
+        _persist_in_background(session, lock)
+        _condense_in_background(session, lock, client)
 
     return {
         "reply": reply,
@@ -11,6 +11,29 @@ BASE_DIR = Path(__file__).resolve().parent.parent.parent
 OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
 MODEL_NAME = os.getenv("MODEL_NAME", "gemma3-medical")
 
+# Concurrent chat requests the app sends to Ollama. Match the server's
+# OLLAMA_NUM_PARALLEL (requests served at once per model); extra requests
+# would only queue there. Set OLLAMA_MAX_LOADED_MODELS=2 on the server so the
+# gynecology and pregnancy models both stay resident.
+OLLAMA_NUM_PARALLEL = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+
+# How long Ollama keeps a model loaded after a request. Sent with the startup
+# warm-up and with every chat request, since each request resets the timer.
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "60m")
+
+# Most recent conversation turns sent to the model each request; older turns
+# stay in the saved session but are dropped from the prompt
+MAX_HISTORY_TURNS = int(os.getenv("MAX_HISTORY_TURNS", "24"))
+
+# Reply cache for identical chat requests (0 disables)
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "512"))
+
+# Embedding model (e.g. nomic-embed-text) used to classify pregnancy status in
+# model replies; empty keeps the keyword matching only. Replies less similar
+# than the threshold to every status label also fall back to keywords.
+STATUS_EMBED_MODEL = os.getenv("STATUS_EMBED_MODEL", "")
+STATUS_EMBED_MIN_SIMILARITY = float(os.getenv("STATUS_EMBED_MIN_SIMILARITY", "0.75"))
+
 # Session storage
 SESSION_DIR = BASE_DIR / "data" / "sessions"
 SESSION_DIR.mkdir(parents=True, exist_ok=True)
@@ -37,4 +60,4 @@ PREGNANCY_RULES = {
 }
 
 
-PREGNANCY_MODEL_NAME = "pregnancy-assistant"
+PREGNANCY_MODEL_NAME = os.getenv("PREGNANCY_MODEL_NAME", "pregnancy-assistant:latest")
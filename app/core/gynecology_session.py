@@ -1,12 +1,101 @@
 """
 Medical Gynecology Session Manager with Ollama Integration
 """
-import json
+import re
+import time
+import httpx
+import orjson
 import requests
-from typing import Dict, List, Optional, Any
+from typing import AsyncIterator, Dict, List, Optional, Any, Union
 from datetime import datetime
-from dataclasses import dataclass, asdict, field
+from pathlib import Path
+from dataclasses import dataclass, field
 from enum import Enum
+from functools import lru_cache
+
+from app.config.settings import (
+    MAX_HISTORY_TURNS, MIN_GYNECOLOGY_AGE, MODEL_NAME, OLLAMA_KEEP_ALIVE, PREGNANCY_RULES
+)
+from app.core.ollama_client import (
+    BLOCKING_TAIL, JSON_HEADERS, STREAM_TAIL, get_http_session, ollama_slots
+)
+from app.core.persistence import dumps_pretty, write_json_atomic
+from app.core.response_cache import chat_cache
+from app.core.timestamps import from_iso, to_iso
+
+
+# the model scripts/setup_model.sh builds from app/models/Modelfile
+DEFAULT_MODEL_NAME = MODEL_NAME
+
+_SYSTEM_PROMPT = """
+شما یک دستیار پزشکی زنان حرفه‌ای هستید که به زبان فارسی با بیمار گفتگو می‌کنید.
+
+وظایف شما:
+1. تنها یک سوال در هر مرحله مطرح کنید.
+2. ترتیب جمع‌آوری شرح حال را رعایت کنید:
+- سن و مشخصات پایه
+- مشکل اصلی و علائم
+- سابقه قاعدگی و بارداری
+- روش‌های پیشگیری، داروها و بیماری‌های زمینه‌ای
+- جراحی‌ها و حساسیت‌ها
+3. سوالات باید واضح، محترمانه و به زبان فارسی باشند.
+4. هیچ تشخیص یا درمان قطعی ارائه ندهید.
+5. اگر پاسخ‌ها احتمال بارداری بدهند، ادامه دهید اما نتیجه‌گیری نکنید.
+6. همیشه هر پیام یک سوال مشخص و کوتاه داشته باشد.
+
+قوانین اضافی:
+- از زبان رسمی و محترمانه استفاده کنید.
+- پیام‌ها کوتاه و قابل فهم باشند.
+- در پایان هر پاسخ، یک سوال بعدی برای ادامه شرح حال بپرسید.
+- از ارائه توضیحات اضافی پزشکی خارج از سوال پرهیز کنید.
+"""
+
+# Sent as the first user turn of every request so the prompt prefix never changes
+# and Ollama can reuse its KV cache from one turn to the next.
+_OPENING_PROMPT = "Start the consultation with a polite greeting and ask the chief complaint."
+
+_OPENING_MSG = {"role": "user", "content": _OPENING_PROMPT}
+
+# Static pieces of the /api/chat request body, encoded once
+_CHAT_OPTIONS = orjson.dumps({"temperature": 0.4, "top_p": 0.9, "num_keep": -1})
+
+# Pregnancy cues, compiled once and matched against each new answer only
+_SYMPTOM_RE = re.compile(
+    "|".join(re.escape(s) for s in PREGNANCY_RULES.get("required_symptoms", []))
+)
+_MONTH_RE = re.compile(r"2 ماه|3 ماه|سه ماه|دو ماه")
+
+# Replies are cached only while the conversation is this short (greeting and
+# first answer after the fixed prefix): later requests are practically unique.
+_CACHEABLE_TURNS = 2
+
+
+@lru_cache(maxsize=8)
+def _encode_head(model_name: str) -> bytes:
+    # keep_alive matches the startup warm-up so each request keeps the model resident
+    return (
+        b'{"model":' + orjson.dumps(model_name)
+        + b',"keep_alive":' + orjson.dumps(OLLAMA_KEEP_ALIVE)
+        + b',"options":' + _CHAT_OPTIONS + b',"messages":['
+    )
+
+
+@lru_cache(maxsize=8)
+def _encode_prefix(system_prompt: str) -> bytes:
+    # system prompt + opening turn, shared by every request of every session
+    return orjson.dumps([{"role": "system", "content": system_prompt}, _OPENING_MSG])[1:-1]
+
+
+def _export_answer(value: Any) -> Any:
+    if isinstance(value, dict) and isinstance(value.get("timestamp"), int):
+        return {**value, "timestamp": to_iso(value["timestamp"])}
+    return value
+
+
+def _import_answer(value: Any) -> Any:
+    if isinstance(value, dict) and isinstance(value.get("timestamp"), str):
+        return {**value, "timestamp": from_iso(value["timestamp"])}
+    return value
 
 
 class SessionStatus(Enum):
@@ -21,20 +110,7 @@ class Message:
     """Message structure for conversation history"""
     role: str  # 'user' or 'assistant' or 'system'
     content: str
-    timestamp: str = field(default_factory=lambda: datetime.utcnow().isoformat())
-
-
-@dataclass
-class SessionState:
-    """Complete session state for persistence"""
-    session_id: str
-    status: str
-    patient_answers: Dict[str, Any]
-    conversation_history: List[Dict[str, Any]]
-    pregnancy_suspicion: bool
-    metadata: Dict[str, Any]
-    created_at: str
-    updated_at: str
+    timestamp: int = field(default_factory=time.time_ns)  # epoch ns, ISO only on export
 
 
 class GynecologySession:
@@ -46,8 +122,9 @@ class GynecologySession:
         self,
         session_id: str,
         ollama_base_url: str = "http://localhost:11434",
-        model_name: str = "gyn-assistant:latest",
-        system_prompt: Optional[str] = None
+        model_name: str = DEFAULT_MODEL_NAME,
+        system_prompt: Optional[str] = None,
+        start_conversation: bool = True
     ):
         self.session_id = session_id
         self.ollama_base_url = ollama_base_url.rstrip("/")
@@ -57,215 +134,331 @@ class GynecologySession:
         self.status = SessionStatus.ACTIVE
         self.patient_answers: Dict[str, Any] = {}
         self.conversation_history: List[Message] = []
+        self._last_assistant: Optional[str] = None
         self.pregnancy_suspicion = False
+        self._symptoms_seen = False
+        self._months_seen = False
+        self._awaiting_age = True
 
         # Metadata
         self.metadata = {"model": model_name, "ollama_url": self.ollama_base_url}
-        self.created_at = datetime.utcnow().isoformat()
+        self.created_at = time.time_ns()
         self.updated_at = self.created_at
 
         # System prompt
-        self.system_prompt = system_prompt or self._default_system_prompt()
-
-        # Initialize conversation
-        self._initialize_conversation()
-
+        self.system_prompt = system_prompt or _SYSTEM_PROMPT
 
-    def _default_system_prompt(self) -> str:
-        return """
-            شما یک دستیار پزشکی زنان حرفه‌ای هستید که به زبان فارسی با بیمار گفتگو می‌کنید.
+        # Ollama-format user/assistant turns, kept in step with conversation_history
+        # by _add_message; the system prompt and opening turn are encoded separately
+        self._api_messages: List[Dict[str, str]] = []
 
-            وظایف شما:
-            1. تنها یک سوال در هر مرحله مطرح کنید.
-            2. ترتیب جمع‌آوری شرح حال را رعایت کنید: 
-            - سن و مشخصات پایه
-            - مشکل اصلی و علائم
-            - سابقه قاعدگی و بارداری
-            - روش‌های پیشگیری، داروها و بیماری‌های زمینه‌ای
-            - جراحی‌ها و حساسیت‌ها
-            3. سوالات باید واضح، محترمانه و به زبان فارسی باشند.
-            4. هیچ تشخیص یا درمان قطعی ارائه ندهید.
-            5. اگر پاسخ‌ها احتمال بارداری بدهند، ادامه دهید اما نتیجه‌گیری نکنید.
-            6. همیشه هر پیام یک سوال مشخص و کوتاه داشته باشد.
-
-            قوانین اضافی:
-            - از زبان رسمی و محترمانه استفاده کنید.
-            - پیام‌ها کوتاه و قابل فهم باشند.
-            - در پایان هر پاسخ، یک سوال بعدی برای ادامه شرح حال بپرسید.
-            - از ارائه توضیحات اضافی پزشکی خارج از سوال پرهیز کنید.
-            """
+        # Initialize conversation (async callers use ainitialize_conversation)
+        if start_conversation:
+            self._initialize_conversation()
 
+    def _rebuild_api_messages(self) -> None:
+        self._api_messages = [
+            {"role": msg.role, "content": msg.content}
+            for msg in self.conversation_history
+            # system پیام‌های تکراری نفرستیم (ما فقط یکی اول می‌فرستیم)
+            if msg.role != "system"
+        ]
+        self._last_assistant = next(
+            (msg.content for msg in reversed(self.conversation_history) if msg.role == "assistant"),
+            None
+        )
 
+    def _turns(self, user_message: Optional[str]) -> List[Dict[str, str]]:
+        if user_message:
+            return self._api_messages + [{"role": "user", "content": user_message}]
+        return self._api_messages
+
+    @staticmethod
+    def _window(turns: List[Dict[str, str]]) -> List[Dict[str, str]]:
+        excess = len(turns) - MAX_HISTORY_TURNS
+        if excess <= 0:
+            return turns
+        # Trimming changes the prompt prefix and costs Ollama its KV cache, so cut
+        # whole half-window blocks: the kept prefix then stays the same for the
+        # next several turns instead of shifting on every one. The step is kept
+        # even so the window still starts on an assistant turn after the prefix,
+        # whatever MAX_HISTORY_TURNS is set to.
+        step = max(MAX_HISTORY_TURNS // 2 & ~1, 2)
+        return turns[-(-excess // step) * step:]
+
+    def _encode_body(self, turns: List[Dict[str, str]], stream: bool) -> bytes:
+        # only the turns are serialised per call; head and prefix are pre-encoded
+        turns = self._window(turns)
+        body = _encode_head(self.model_name) + _encode_prefix(self.system_prompt)
+        if turns:
+            body += b"," + orjson.dumps(turns)[1:-1]
+        return body + (STREAM_TAIL if stream else BLOCKING_TAIL)
+
+    def _cache_key(self, turns: List[Dict[str, str]]) -> Optional[str]:
+        if len(turns) > _CACHEABLE_TURNS:
+            return None
+        # suspicion is part of the key so a reply is never reused across that safety state
+        return chat_cache.make_key(
+            self.model_name, self.pregnancy_suspicion, self.system_prompt, turns
+        )
 
+    @staticmethod
+    def _extract_reply(result: Dict[str, Any]) -> Optional[str]:
+        assistant_message = result.get("message", {}).get("content", "")
+        assistant_message = (assistant_message or "").strip()
+        return assistant_message if assistant_message else None
 
-    def _call_ollama(self, user_message: str) -> Optional[str]:
+    def _call_ollama(self, user_message: Optional[str] = None) -> Optional[str]:
         """
         Make a REST API call to Ollama /api/chat.
         """
         url = f"{self.ollama_base_url}/api/chat"
-
-        messages = []
-
-        # ✅ system prompt first
-        if self.system_prompt:
-            messages.append({"role": "system", "content": self.system_prompt})
-
-        # conversation history
-        for msg in self.conversation_history:
-            # system پیام‌های تکراری نفرستیم (ما فقط یکی اول می‌فرستیم)
-            if msg.role == "system":
-                continue
-            messages.append({"role": msg.role, "content": msg.content})
-
-        if user_message:
-            messages.append({"role": "user", "content": user_message})
-
-        payload = {
-            "model": self.model_name,
-            "messages": messages,
-            "stream": False,
-            "options": {"temperature": 0.4, "top_p": 0.9}
-        }
+        turns = self._turns(user_message)
+        cache_key = self._cache_key(turns)
+        if cache_key and (cached := chat_cache.get(cache_key)):
+            return cached
 
         try:
-            response = requests.post(
+            response = get_http_session().post(
                 url,
-                json=payload,
-                headers={"Content-Type": "application/json"},
+                data=self._encode_body(turns, stream=False),
+                headers=JSON_HEADERS,
                 timeout=30
             )
             response.raise_for_status()
-            result = response.json()
+            reply = self._extract_reply(response.json())
+            if cache_key and reply:
+                chat_cache.put(cache_key, reply)
+            return reply
 
-            assistant_message = result.get("message", {}).get("content", "")
-            assistant_message = (assistant_message or "").strip()
+        except requests.exceptions.RequestException as e:
+            print(f"Error calling Ollama API: {e}")
+            return None
 
-            return assistant_message if assistant_message else None
+    async def acall_ollama(
+        self, client: httpx.AsyncClient, user_message: Optional[str] = None
+    ) -> Optional[str]:
+        """
+        Async variant of _call_ollama using a shared httpx.AsyncClient.
+        """
+        url = f"{self.ollama_base_url}/api/chat"
+        turns = self._turns(user_message)
+        cache_key = self._cache_key(turns)
+        if cache_key and (cached := chat_cache.get(cache_key)):
+            return cached
 
-        except requests.exceptions.RequestException as e:
+        try:
+            body = self._encode_body(turns, stream=False)
+            async with ollama_slots():
+                response = await client.post(url, content=body, headers=JSON_HEADERS)
+            response.raise_for_status()
+            reply = self._extract_reply(response.json())
+            if cache_key and reply:
+                chat_cache.put(cache_key, reply)
+            return reply
+
+        except httpx.HTTPError as e:
             print(f"Error calling Ollama API: {e}")
             return None
 
+    async def _astream_ollama(
+        self, client: httpx.AsyncClient, user_message: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream the reply from Ollama /api/chat, yielding content chunks as they arrive.
+        """
+        url = f"{self.ollama_base_url}/api/chat"
+        turns = self._turns(user_message)
+        cache_key = self._cache_key(turns)
+        if cache_key and (cached := chat_cache.get(cache_key)):
+            yield cached
+            return
+
+        try:
+            parts = []
+            body = self._encode_body(turns, stream=True)
+            async with ollama_slots(), client.stream(
+                "POST", url, content=body, headers=JSON_HEADERS
+            ) as response:
+                response.raise_for_status()
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    content = orjson.loads(line).get("message", {}).get("content", "")
+                    if content:
+                        parts.append(content)
+                        yield content
+
+            reply = "".join(parts).strip()
+            if cache_key and reply:
+                chat_cache.put(cache_key, reply)
+
+        except httpx.HTTPError as e:
+            print(f"Error calling Ollama API: {e}")
+
     def _initialize_conversation(self) -> None:
-        opening = self._call_ollama(
-            "Start the consultation with a polite greeting and ask the chief complaint."
-        )
+        opening = self._call_ollama()
+        if opening:
+            self._add_message("assistant", opening)
+
+    async def ainitialize_conversation(self, client: httpx.AsyncClient) -> None:
+        opening = await self.acall_ollama(client)
         if opening:
             self._add_message("assistant", opening)
 
     def _add_message(self, role: str, content: str) -> None:
         msg = Message(role=role, content=content)
         self.conversation_history.append(msg)
-        self.updated_at = datetime.utcnow().isoformat()
+        if role != "system":
+            self._api_messages.append({"role": role, "content": content})
+        if role == "assistant":
+            self._last_assistant = content
+        self.updated_at = msg.timestamp
 
     def _validate_age(self, answer: str) -> Optional[str]:
-        try:
-            year = int(answer.strip())
-            current_year = datetime.utcnow().year
-            age = current_year - year
-
-            from app.config.settings import MIN_GYNECOLOGY_AGE
-            if age < MIN_GYNECOLOGY_AGE:
-                self.status = SessionStatus.SUSPENDED
-                return "با توجه به سن بیمار، این نوع ویزیت نیازمند بررسی و ارجاع حضوری توسط پزشک متخصص است."
-        except ValueError:
-            pass
+        answer = answer.strip()
+        # free-text replies are the common case: skip them without raising ValueError
+        if not answer.isdecimal():
+            return None
+
+        age = datetime.utcnow().year - int(answer)
+        if age < MIN_GYNECOLOGY_AGE:
+            self.status = SessionStatus.SUSPENDED
+            return "با توجه به سن بیمار، این نوع ویزیت نیازمند بررسی و ارجاع حضوری توسط پزشک متخصص است."
         return None
 
-    def submit_answer(self, question_key: str, answer: str) -> Optional[str]:
+    def _record_answer(self, question_key: str, answer: str) -> Optional[str]:
+        """
+        Store the answer and run the safety checks.
+        Returns an age warning that ends the turn, or None to ask the model.
+        """
         if self.status != SessionStatus.ACTIVE:
             raise ValueError(f"Session is not active. Status: {self.status.value}")
 
         # Store the answer
         self.patient_answers[question_key] = {
             "answer": answer,
-            "timestamp": datetime.utcnow().isoformat()
+            "timestamp": time.time_ns()
         }
 
         # ✅ pregnancy detection AFTER storing answer
-        self._detect_pregnancy()
+        self._detect_pregnancy(answer)
 
         # Age validation (only once)
-        if question_key.lower().startswith("q") and not self.patient_answers.get("_age_checked"):
+        if self._awaiting_age and question_key.lower().startswith("q"):
+            self._awaiting_age = False
             age_warning = self._validate_age(answer)
-            self.patient_answers["_age_checked"] = True
             if age_warning:
                 self._add_message("assistant", age_warning)
                 return age_warning
 
         # Add user message to history
         self._add_message("user", answer)
+        return None
 
-        # Ask next question
-        next_question = self._call_ollama(
-            "پاسخ بیمار ثبت شد. لطفاً سوال بعدی را طبق ترتیب شرح حال بپرس."
-        )
+    def _record_question(self, next_question: Optional[str]) -> Optional[str]:
+        # updated_at was already refreshed when the answer was recorded
         if next_question:
             self._add_message("assistant", next_question)
-
-        self.updated_at = datetime.utcnow().isoformat()
         return next_question
 
+    def submit_answer(self, question_key: str, answer: str) -> Optional[str]:
+        age_warning = self._record_answer(question_key, answer)
+        if age_warning:
+            return age_warning
+
+        # Ask next question; the answer just added is the last user turn
+        return self._record_question(self._call_ollama())
+
+    async def asubmit_answer(
+        self, client: httpx.AsyncClient, question_key: str, answer: str
+    ) -> Optional[str]:
+        age_warning = self._record_answer(question_key, answer)
+        if age_warning:
+            return age_warning
+
+        return self._record_question(await self.acall_ollama(client))
+
+    async def astream_answer(
+        self, client: httpx.AsyncClient, question_key: str, answer: str
+    ) -> AsyncIterator[str]:
+        """
+        Like asubmit_answer, but yields the next question chunk by chunk.
+        """
+        age_warning = self._record_answer(question_key, answer)
+        if age_warning:
+            yield age_warning
+            return
+
+        parts = []
+        stream = self._astream_ollama(client)
+        try:
+            async for chunk in stream:
+                parts.append(chunk)
+                yield chunk
+        finally:
+            # also runs when the consumer stops early (client disconnect): release the
+            # Ollama connection and keep whatever part of the reply was received
+            await stream.aclose()
+            self._record_question("".join(parts).strip() or None)
+
     def get_current_question(self) -> Optional[str]:
-        for msg in reversed(self.conversation_history):
-            if msg.role == "assistant":
-                return msg.content
-        return None
+        return self._last_assistant
 
     def complete_session(self) -> None:
         self.status = SessionStatus.COMPLETED
-        self.updated_at = datetime.utcnow().isoformat()
+        self.updated_at = time.time_ns()
 
     def suspend_session(self) -> None:
         self.status = SessionStatus.SUSPENDED
-        self.updated_at = datetime.utcnow().isoformat()
+        self.updated_at = time.time_ns()
 
     def to_dict(self) -> Dict[str, Any]:
         return {
             "session_id": self.session_id,
             "status": self.status.value,
-            "patient_answers": self.patient_answers,
-            "conversation_history": [asdict(msg) for msg in self.conversation_history],
+            "patient_answers": {
+                key: _export_answer(value) for key, value in self.patient_answers.items()
+            },
+            "conversation_history": [
+                {"role": msg.role, "content": msg.content, "timestamp": to_iso(msg.timestamp)}
+                for msg in self.conversation_history
+            ],
             "pregnancy_suspicion": self.pregnancy_suspicion,
+            "awaiting_age": self._awaiting_age,
+            "symptoms_seen": self._symptoms_seen,
+            "months_seen": self._months_seen,
             "metadata": self.metadata,
-            "created_at": self.created_at,
-            "updated_at": self.updated_at
+            "created_at": to_iso(self.created_at),
+            "updated_at": to_iso(self.updated_at)
         }
 
     def to_json(self) -> str:
-        state = SessionState(
-            session_id=self.session_id,
-            status=self.status.value,
-            patient_answers=self.patient_answers,
-            conversation_history=[asdict(msg) for msg in self.conversation_history],
-            pregnancy_suspicion=self.pregnancy_suspicion,
-            metadata=self.metadata,
-            created_at=self.created_at,
-            updated_at=self.updated_at
-        )
-        return json.dumps(asdict(state), indent=2, ensure_ascii=False)
+        return dumps_pretty(self.to_dict())
 
     def save_to_file(self, filepath: str) -> None:
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(self.to_json())
+        write_json_atomic(filepath, self.to_dict())
 
     @classmethod
-    def load_from_file(cls, filepath: str, ollama_base_url: str = "http://localhost:11434") -> "GynecologySession":
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        return cls.from_dict(data, ollama_base_url)
+    def load_from_file(
+        cls, filepath: Union[str, Path], ollama_base_url: str = "http://localhost:11434"
+    ) -> "GynecologySession":
+        return cls.from_dict(orjson.loads(Path(filepath).read_bytes()), ollama_base_url)
 
     @classmethod
     def from_dict(cls, data: Dict[str, Any], ollama_base_url: str = "http://localhost:11434") -> "GynecologySession":
         session = cls(
             session_id=data["session_id"],
             ollama_base_url=ollama_base_url,
-            model_name=data.get("metadata", {}).get("model", "gemma3-medical"),
-            system_prompt=None
+            model_name=data.get("metadata", {}).get("model", DEFAULT_MODEL_NAME),
+            system_prompt=None,
+            start_conversation=False
         )
 
         session.status = SessionStatus(data.get("status", SessionStatus.ACTIVE.value))
-        session.patient_answers = data.get("patient_answers", {})
+        session.patient_answers = {
+            key: _import_answer(value) for key, value in data.get("patient_answers", {}).items()
+        }
 
         # ✅ restore conversation history correctly
         raw_hist = data.get("conversation_history", [])
@@ -276,34 +469,46 @@ class GynecologySession:
                     Message(
                         role=item["role"],
                         content=item["content"],
-                        timestamp=item.get("timestamp", datetime.utcnow().isoformat())
+                        timestamp=from_iso(item.get("timestamp"), session.created_at)
                     )
                 )
+        session._rebuild_api_messages()
+
+        if "symptoms_seen" in data:
+            session._symptoms_seen = bool(data["symptoms_seen"])
+            session._months_seen = bool(data.get("months_seen", False))
+        else:
+            # older files did not store the flags; rebuild them from the answers
+            for value in session.patient_answers.values():
+                if isinstance(value, dict):
+                    session._detect_pregnancy(value.get("answer", ""))
 
         session.pregnancy_suspicion = bool(data.get("pregnancy_suspicion", False))
+        # older files marked the age check inside patient_answers
+        session._awaiting_age = bool(
+            data.get("awaiting_age", "_age_checked" not in session.patient_answers)
+        )
         session.metadata = data.get("metadata", session.metadata)
-        session.created_at = data.get("created_at", session.created_at)
-        session.updated_at = data.get("updated_at", session.updated_at)
+        session.created_at = from_iso(data.get("created_at"), session.created_at)
+        session.updated_at = from_iso(data.get("updated_at"), session.updated_at)
 
         return session
 
-    def _detect_pregnancy(self) -> None:
-        answers_text = " ".join(
-            v.get("answer", "") for v in self.patient_answers.values() if isinstance(v, dict)
-        )
+    def _detect_pregnancy(self, answer: str) -> None:
+        if self.pregnancy_suspicion:
+            return
 
-        from app.config.settings import PREGNANCY_RULES
-
-        symptoms_found = any(
-            symptom in answers_text for symptom in PREGNANCY_RULES.get("required_symptoms", [])
-        )
-        months_found = any(word in answers_text for word in ["2 ماه", "3 ماه", "سه ماه", "دو ماه"])
+        # Symptoms and timing may come in different answers, so remember both
+        if not self._symptoms_seen and _SYMPTOM_RE.search(answer):
+            self._symptoms_seen = True
+        if not self._months_seen and _MONTH_RE.search(answer):
+            self._months_seen = True
 
-        if symptoms_found and months_found:
+        if self._symptoms_seen and self._months_seen:
             self.pregnancy_suspicion = True
 
     def switch_model(self, new_model_name: str) -> None:
         self.model_name = new_model_name
         self.metadata["model"] = new_model_name
-        self.metadata["model_switched_at"] = datetime.utcnow().isoformat()
-        self.updated_at = datetime.utcnow().isoformat()
+        self.updated_at = time.time_ns()
+        self.metadata["model_switched_at"] = to_iso(self.updated_at)
@@ -0,0 +1,54 @@
+"""
+Shared HTTP connection pool and concurrency limit for Ollama REST calls
+"""
+import asyncio
+import weakref
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.config.settings import OLLAMA_NUM_PARALLEL
+
+
+# Pre-encoded pieces of every /api/chat request body; the session classes
+# splice their own head and messages in between
+BLOCKING_TAIL = b'],"stream":false}'
+STREAM_TAIL = b'],"stream":true}'
+JSON_HEADERS = {"Content-Type": "application/json"}
+
+_http_session: Optional[requests.Session] = None
+_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_http_session() -> requests.Session:
+    """
+    Return the process-wide requests.Session, creating it on first use.
+    Reusing one keep-alive pool avoids a new TCP connection per chat turn.
+    """
+    global _http_session
+    if _http_session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({
+            "Connection": "keep-alive",
+            "Accept-Encoding": "gzip"
+        })
+        _http_session = session
+    return _http_session
+
+
+def ollama_slots() -> asyncio.Semaphore:
+    """
+    Semaphore limiting in-flight async Ollama requests to OLLAMA_NUM_PARALLEL.
+    One per event loop, since asyncio primitives cannot be shared across loops.
+    """
+    loop = asyncio.get_running_loop()
+    slots = _slots.get(loop)
+    if slots is None:
+        slots = _slots[loop] = asyncio.Semaphore(OLLAMA_NUM_PARALLEL)
+    return slots
@@ -0,0 +1,20 @@
+"""
+JSON encoding and atomic file writes shared by the session classes
+"""
+import os
+from typing import Any, Dict
+
+import orjson
+
+
+def dumps_pretty(data: Dict[str, Any]) -> str:
+    """Indented JSON for debugging; files on disk use the compact form."""
+    return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode("utf-8")
+
+
+def write_json_atomic(filepath: str, data: Dict[str, Any]) -> None:
+    """Write compact JSON to a temp file and swap it in, so a crash never leaves a half-written file."""
+    tmp = f"{filepath}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS))
+    os.replace(tmp, filepath)
@@ -1,13 +1,56 @@
 """
 Pregnancy Session Manager - Specialized Module for Pregnancy Cases
 """
-import json
+import re
+from bisect import bisect_right
+import time
+import httpx
+import orjson
 import requests
-from typing import Dict, List, Optional, Any
-from datetime import datetime
-from dataclasses import dataclass, asdict, field
+from typing import Dict, Iterator, List, Optional, Any, Tuple
+from dataclasses import dataclass, field
 from enum import Enum
 
+from app.config.settings import OLLAMA_KEEP_ALIVE, PREGNANCY_MODEL_NAME, STATUS_EMBED_MODEL
+from app.core.ollama_client import (
+    BLOCKING_TAIL, JSON_HEADERS, STREAM_TAIL, get_http_session, ollama_slots
+)
+from app.core.persistence import dumps_pretty, write_json_atomic
+from app.core.response_cache import chat_cache, normalize_message
+from app.core.status_classifier import aclassify_status, classify_status
+from app.core.timestamps import from_iso, to_iso
+
+
+_INTRO_NOTICE = "بر اساس اطلاعات قبلی، احتمال بارداری بررسی می‌شود."
+_INTRO_PROMPT = f"{_INTRO_NOTICE} اولین سوال را مطرح کنید."
+
+_REPORT_PROMPT = (
+    "بر اساس این گفتگو، گزارش نهایی مشاوره بارداری را به صورت خلاصه بنویسید: "
+    "علائم، سابقه، آزمایش‌های لازم و توصیه‌ها."
+)
+
+_CONDENSE_PROMPT = "لطفاً خلاصه‌ای از موارد پزشکی این گفتگو را در حداکثر ۳۰۰ کلمه ارائه کنید."
+
+_CHAT_OPTIONS = orjson.dumps({"temperature": 0.6, "top_p": 0.85})
+
+
+_KEYWORDS = {
+    "symptom": ("تهوع", "حالت", "پستان", "خستگی", "تاخیر"),
+    "confirmed": ("تایید", "confirmed", "مثبت"),
+    "test": ("آزمایش", "test", "بتا"),
+    "ruled_out": ("منفی", "negative", "رد"),
+    "lmp": ("قاعدگی", "lmp"),
+}
+_KEYWORD_CATEGORY = {w: cat for cat, words in _KEYWORDS.items() for w in words}
+# یک پیمایش روی متن؛ lookahead کلیدواژه‌های هم‌پوشان را هم گزارش می‌کند
+_KEYWORD_RE = re.compile(
+    "(?=(" + "|".join(map(re.escape, sorted(_KEYWORD_CATEGORY, key=len, reverse=True))) + "))"
+)
+
+
+def _keyword_categories(text: str) -> set:
+    return {_KEYWORD_CATEGORY[w] for w in _KEYWORD_RE.findall(text.lower())}
+
 
 class PregnancyStatus(Enum):
     SUSPECTED = "suspected"
@@ -16,7 +59,7 @@ class PregnancyStatus(Enum):
     NEEDS_TESTING = "needs_testing"
 
 
-@dataclass
+@dataclass(slots=True)
 class PregnancyData:
     lmp: Optional[str] = None
     gestational_age: Optional[int] = None
@@ -31,12 +74,19 @@ class PregnancySession:
     Pregnancy consultation session (Ollama-based)
     """
 
+    # پنجره تاریخچه ارسالی به مدل؛ مرز پنجره هر CACHE_BUFFER پیام یک‌بار جابه‌جا می‌شود
+    RECENT_MESSAGES = 20
+    CACHE_BUFFER = 6
+    # وقتی متن پیام‌های خلاصه‌نشده از این حد بگذرد، همه جز CONDENSE_KEEP پیام آخر خلاصه می‌شوند
+    CONDENSE_THRESHOLD_CHARS = 8000
+    CONDENSE_KEEP = 6
+
     def __init__(
         self,
         session_id: str,
         gynecology_session_data: Optional[Dict] = None,
         ollama_base_url: str = "http://localhost:11434",
-        pregnancy_model: str = "pregnancy-assistant:latest"
+        pregnancy_model: str = PREGNANCY_MODEL_NAME
     ):
         self.session_id = session_id
         self.ollama_base_url = ollama_base_url.rstrip("/")
@@ -45,6 +95,15 @@ class PregnancySession:
         self.status = PregnancyStatus.SUSPECTED
         self.pregnancy_data = PregnancyData()
         self.conversation_history: List[Dict[str, Any]] = []
+        # همان پیام‌ها بدون timestamp، به شکلی که به Ollama فرستاده می‌شوند
+        self._ollama_history: List[Dict[str, str]] = []
+        self._window_start_idx = 0
+        # خلاصه پیام‌های قدیمی‌تر از _condensed_upto که به جای خودشان به مدل فرستاده می‌شود
+        self.history_summary: Optional[str] = None
+        self._condensed_upto = 0
+        self._encoded_summary = b""
+        # مقدمه به جای یک فراخوانی جداگانه، همراه اولین پاسخ بیمار ارسال می‌شود
+        self.intro_pending = False
 
         self.metadata = {
             "model": pregnancy_model,
@@ -52,14 +111,17 @@ class PregnancySession:
             "source_session_id": None
         }
 
-        self.created_at = datetime.utcnow().isoformat()
+        self.created_at = time.time_ns()  # نانوثانیه epoch؛ فقط هنگام خروجی به ISO تبدیل می‌شود
         self.updated_at = self.created_at
 
         self.system_prompt = self._pregnancy_system_prompt()
+        self.gyn_summary: Optional[str] = None
 
         if gynecology_session_data:
             self._import_from_gynecology(gynecology_session_data)
 
+        self._freeze_prefix()
+
     # --------------------------------------------------
     def _pregnancy_system_prompt(self) -> str:
         return (
@@ -85,17 +147,28 @@ class PregnancySession:
         self.metadata["source_session_id"] = gyn_data.get("session_id")
 
         patient_answers = gyn_data.get("patient_answers", {})
-        for key, value in patient_answers.items():
-            answer_text = value.get("answer", "") if isinstance(value, dict) else str(value)
-            answer_lower = answer_text.lower()
-
+        texts = [
+            value.get("answer", "") if isinstance(value, dict) else str(value)
+            for value in patient_answers.values()
+        ]
+
+        # یک جستجوی واحد روی همه پاسخ‌ها؛ محل هر تطابق به پاسخ مربوطش نگاشت می‌شود
+        lowered = [text.lower() for text in texts]
+        starts, offset = [], 0
+        for text in lowered:
+            starts.append(offset)
+            offset += len(text) + 1
+        found = [set() for _ in texts]
+        for match in _KEYWORD_RE.finditer("\0".join(lowered)):
+            found[bisect_right(starts, match.start()) - 1].add(_KEYWORD_CATEGORY[match.group(1)])
+
+        for key, answer_text, categories in zip(patient_answers, texts, found):
             # شناسایی LMP
-            if "lmp" in key.lower() or "قاعدگی" in answer_text:
+            if "lmp" in key.lower() or "lmp" in categories:
                 self.pregnancy_data.lmp = answer_text
 
             # شناسایی علائم بارداری
-            pregnancy_symptoms = ["تهوع", "حالت", "پستان", "خستگی", "تاخیر"]
-            if any(symptom in answer_text for symptom in pregnancy_symptoms):
+            if "symptom" in categories:
                 self.pregnancy_data.symptoms.append(answer_text)
 
         # خلاصه‌سازی تاریخچه جلسه زنان
@@ -106,100 +179,337 @@ class PregnancySession:
                 summary_lines.append(f"- بیمار: {msg['content'][:100]}")
         summary = "\n".join(summary_lines)
 
-        self.conversation_history.append({
-            "role": "system",
-            "content": f"خلاصه جلسه زنان:\n{summary}",
-            "timestamp": datetime.utcnow().isoformat()
-        })
+        self.gyn_summary = f"خلاصه جلسه زنان:\n{summary}"
 
         print(f"✅ داده دریافت شد - علائم بارداری: {len(self.pregnancy_data.symptoms)}")
 
     # --------------------------------------------------
-    def _call_pregnancy_model(self, user_message: str) -> Optional[str]:
-        url = f"{self.ollama_base_url}/api/chat"
+    def _freeze_prefix(self) -> None:
+        """
+        System prompt + gyn summary, built once and never mutated so every
+        request starts with identical bytes and Ollama can reuse its KV cache
+        """
+        prefix = [{"role": "system", "content": self.system_prompt}]
+        if self.gyn_summary:
+            prefix.append({"role": "system", "content": self.gyn_summary})
+        self._frozen_prefix = prefix
+        self._encoded_head = (
+            b'{"model":' + orjson.dumps(self.pregnancy_model)
+            + b',"keep_alive":' + orjson.dumps(OLLAMA_KEEP_ALIVE)
+            + b',"options":' + _CHAT_OPTIONS
+            + b',"messages":[' + orjson.dumps(prefix)[1:-1]
+        )
 
-        messages = [{"role": "system", "content": self.system_prompt}]
+    def _recent_history(self) -> List[Dict[str, str]]:
+        """
+        Last RECENT_MESSAGES..RECENT_MESSAGES + CACHE_BUFFER turns. The start only
+        advances once the buffer is used up, so consecutive requests share a prefix.
+        """
+        history = self._ollama_history
+        start = max(self._window_start_idx, self._condensed_upto)
+        if len(history) - start > self.RECENT_MESSAGES + self.CACHE_BUFFER:
+            start = len(history) - self.RECENT_MESSAGES
+        self._window_start_idx = start
+        return history[start:]
+
+    def _encode_body(
+        self,
+        user_message: Optional[str],
+        stream: bool = False,
+        turns: Optional[List[Dict[str, str]]] = None
+    ) -> bytes:
+        # در هر فراخوانی فقط پنجره تاریخچه سریال می‌شود؛ مدل، تنظیمات و پیشوند از قبل آماده‌اند
+        if turns is None:
+            turns = self._recent_history()
+        if user_message:
+            turns = turns + [{"role": "user", "content": user_message}]
 
-        for msg in self.conversation_history:
-            if msg["role"] != "system":
-                messages.append({"role": msg["role"], "content": msg["content"]})
+        body = self._encoded_head + self._encoded_summary
+        if turns:
+            body += b"," + orjson.dumps(turns)[1:-1]
+        return body + (STREAM_TAIL if stream else BLOCKING_TAIL)
 
-        if user_message:
-            messages.append({"role": "user", "content": user_message})
+    def _cache_key(self, user_message: Optional[str]) -> str:
+        """
+        Keyed on the frozen prefix, the question being answered and the normalized
+        answer, so repeated short replies ("بله", "خیر", ...) skip the model call
+        """
+        history = self._ollama_history
+        if user_message is None and history and history[-1]["role"] == "user":
+            user_message = history[-1]["content"]
+            history = history[:-1]
 
-        payload = {
-            "model": self.pregnancy_model,
-            "messages": messages,
-            "stream": False,
-            "options": {"temperature": 0.6, "top_p": 0.85}
-        }
+        last_question = None
+        for msg in reversed(history):
+            if msg["role"] == "assistant":
+                last_question = msg["content"]
+                break
+
+        return chat_cache.make_key(
+            self.pregnancy_model,
+            self._frozen_prefix,
+            last_question,
+            normalize_message(user_message or "")
+        )
+
+    def _handle_reply(self, answer: Optional[str], detect_status: bool = True) -> Optional[str]:
+        answer = (answer or "").strip()
+
+        if answer:
+            if detect_status:
+                self._detect_pregnancy_status(answer, classify_status(self.ollama_base_url, answer))
+            self.updated_at = time.time_ns()
+
+        return answer or None
+
+    def _call_pregnancy_model(
+        self,
+        user_message: Optional[str],
+        detect_status: bool = True,
+        use_cache: bool = True,
+        body: Optional[bytes] = None
+    ) -> Optional[str]:
+        cache_key = self._cache_key(user_message) if use_cache else None
+        if cache_key and (cached := chat_cache.get(cache_key)):
+            return self._handle_reply(cached, detect_status)
+
+        url = f"{self.ollama_base_url}/api/chat"
+        body = body or self._encode_body(user_message)
 
         try:
-            response = requests.post(url, json=payload, timeout=45)
+            response = get_http_session().post(url, data=body, headers=JSON_HEADERS, timeout=45)
             response.raise_for_status()
+            reply = self._handle_reply(
+                response.json().get("message", {}).get("content"), detect_status
+            )
+            if cache_key and reply:
+                chat_cache.put(cache_key, reply)
+            return reply
 
-            result = response.json()
-            answer = result.get("message", {}).get("content", "")
-            answer = (answer or "").strip()
+        except requests.exceptions.RequestException as e:
+            print(f"Pregnancy model error: {e}")
+            return None
 
-            if answer:
-                self._detect_pregnancy_status(answer)
-                self.updated_at = datetime.utcnow().isoformat()
+    def _stream_pregnancy_model(self, user_message: Optional[str]) -> Iterator[str]:
+        """
+        Stream the reply from Ollama /api/chat, yielding content chunks as they arrive.
+        """
+        cache_key = self._cache_key(user_message)
+        if cached := chat_cache.get(cache_key):
+            yield self._handle_reply(cached)
+            return
 
-            return answer or None
+        url = f"{self.ollama_base_url}/api/chat"
+        body = self._encode_body(user_message, stream=True)
+
+        try:
+            parts = []
+            with get_http_session().post(
+                url, data=body, headers=JSON_HEADERS, stream=True, timeout=45
+            ) as response:
+                response.raise_for_status()
+                for line in response.iter_lines():
+                    if not line:
+                        continue
+                    content = orjson.loads(line).get("message", {}).get("content", "")
+                    if content:
+                        parts.append(content)
+                        yield content
+
+            reply = self._handle_reply("".join(parts))
+            if reply:
+                chat_cache.put(cache_key, reply)
 
         except requests.exceptions.RequestException as e:
             print(f"Pregnancy model error: {e}")
+
+    async def _acall_pregnancy_model(
+        self, client: httpx.AsyncClient, user_message: Optional[str]
+    ) -> Optional[str]:
+        reply = await self._afetch_reply(client, user_message, detect_status=not STATUS_EMBED_MODEL)
+        if reply and STATUS_EMBED_MODEL:
+            # دسته‌بندی اینجا انجام می‌شود تا فراخوانی embedding حلقه رویداد را مسدود نکند
+            category = await aclassify_status(client, self.ollama_base_url, reply)
+            self._detect_pregnancy_status(reply, category)
+        return reply
+
+    async def _afetch_reply(
+        self,
+        client: httpx.AsyncClient,
+        user_message: Optional[str],
+        detect_status: bool = True,
+        use_cache: bool = True,
+        body: Optional[bytes] = None
+    ) -> Optional[str]:
+        cache_key = self._cache_key(user_message) if use_cache else None
+        if cache_key and (cached := chat_cache.get(cache_key)):
+            return self._handle_reply(cached, detect_status)
+
+        url = f"{self.ollama_base_url}/api/chat"
+        body = body or self._encode_body(user_message)
+
+        try:
+            async with ollama_slots():
+                response = await client.post(url, content=body, headers=JSON_HEADERS, timeout=45)
+            response.raise_for_status()
+            reply = self._handle_reply(
+                response.json().get("message", {}).get("content"), detect_status
+            )
+            if cache_key and reply:
+                chat_cache.put(cache_key, reply)
+            return reply
+
+        except httpx.HTTPError as e:
+            print(f"Pregnancy model error: {e}")
             return None
 
     # --------------------------------------------------
-    def _detect_pregnancy_status(self, text: str) -> None:
-        t = text.lower()
-        if any(w in t for w in ["تایید", "confirmed", "مثبت"]):
+    def _detect_pregnancy_status(self, text: str, category: Optional[str] = None) -> None:
+        # دسته حاصل از embedding در صورت وجود، وگرنه جستجوی کلیدواژه
+        found = {category} if category else _keyword_categories(text)
+        if "confirmed" in found:
             self.status = PregnancyStatus.CONFIRMED
-        elif any(w in t for w in ["آزمایش", "test", "بتا"]):
+        elif "test" in found:
             self.status = PregnancyStatus.NEEDS_TESTING
-        elif any(w in t for w in ["منفی", "negative", "رد"]):
+        elif "ruled_out" in found:
             self.status = PregnancyStatus.RULED_OUT
 
     # --------------------------------------------------
-    def start(self) -> Optional[str]:
+    def _record(self, role: str, content: Optional[str]) -> Optional[str]:
+        if content:
+            self.conversation_history.append({
+                "role": role,
+                "content": content,
+                "timestamp": time.time_ns()
+            })
+            self._ollama_history.append({"role": role, "content": content})
+        return content
+
+    def _record_answer(self, answer: str) -> None:
+        if not self.intro_pending:
+            self._record("user", answer)
+            return
+
+        # متن ارسالی به مدل در "prompt" ذخیره می‌شود تا پس از بارگذاری هم یکسان بماند
+        prompt = f"{_INTRO_PROMPT}\n\nپاسخ بیمار: {answer}"
+        self._record("user", answer)
+        self.conversation_history[-1]["prompt"] = prompt
+        self._ollama_history[-1]["content"] = prompt
+        self.intro_pending = False
+
+    def defer_start(self) -> str:
+        """
+        Skip the opening model call: show a fixed notice now and send the intro
+        together with the patient's first answer.
+        """
         if self.conversation_history:
             return self.get_last_assistant_message()
 
-        intro = (
-            "بر اساس اطلاعات قبلی، احتمال بارداری بررسی می‌شود. "
-            "اولین سوال را مطرح کنید."
+        self.intro_pending = True
+        return _INTRO_NOTICE
+
+    def _set_history_summary(self, summary: Optional[str], condensed_upto: int) -> None:
+        self.history_summary = summary
+        self._condensed_upto = condensed_upto
+        self._encoded_summary = (
+            b"," + orjson.dumps({"role": "system", "content": f"خلاصه گفتگو تاکنون:\n{summary}"})
+            if summary else b""
         )
-        q = self._call_pregnancy_model(intro)
 
-        if q:
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": q,
-                "timestamp": datetime.utcnow().isoformat()
-            })
+    def _needs_condense(self) -> bool:
+        pending = self._ollama_history[self._condensed_upto:]
+        return (
+            len(pending) > self.CONDENSE_KEEP
+            and sum(len(m["content"]) for m in pending) > self.CONDENSE_THRESHOLD_CHARS
+        )
+
+    def _condense_request(self) -> Tuple[int, bytes]:
+        # همه پیام‌های پس از آخرین خلاصه، نه فقط پنجره، تا هیچ پیامی بدون خلاصه کنار گذاشته نشود
+        upto = len(self._ollama_history) - self.CONDENSE_KEEP
+        turns = self._ollama_history[self._condensed_upto:]
+        return upto, self._encode_body(_CONDENSE_PROMPT, turns=turns)
+
+    def _apply_condense(self, summary: Optional[str], upto: int) -> bool:
+        # فقط تاریخچه ارسالی به مدل کوتاه می‌شود؛ conversation_history همه پیام‌ها را نگه می‌دارد
+        if summary:
+            self._set_history_summary(summary, upto)
+        return bool(summary)
+
+    def condense_if_needed(self) -> bool:
+        """
+        Fold older turns into one summary message. Call it after the reply has
+        been shown, so the extra model call never delays the patient.
+        Returns True when the history was condensed.
+        """
+        if not self._needs_condense():
+            return False
+        upto, body = self._condense_request()
+        return self._apply_condense(
+            self._call_pregnancy_model(None, detect_status=False, use_cache=False, body=body), upto
+        )
 
-        return q
+    async def acondense_if_needed(self, client: httpx.AsyncClient) -> bool:
+        if not self._needs_condense():
+            return False
+        upto, body = self._condense_request()
+        return self._apply_condense(
+            await self._afetch_reply(
+                client, None, detect_status=False, use_cache=False, body=body
+            ),
+            upto
+        )
+
+    def start(self) -> Optional[str]:
+        if self.conversation_history:
+            return self.get_last_assistant_message()
+
+        return self._record("assistant", self._call_pregnancy_model(_INTRO_PROMPT))
+
+    async def astart(self, client: httpx.AsyncClient) -> Optional[str]:
+        if self.conversation_history:
+            return self.get_last_assistant_message()
+
+        return self._record("assistant", await self._acall_pregnancy_model(client, _INTRO_PROMPT))
 
     # --------------------------------------------------
     def submit_answer(self, answer: str) -> Optional[str]:
-        self.conversation_history.append({
-            "role": "user",
-            "content": answer,
-            "timestamp": datetime.utcnow().isoformat()
-        })
+        self._record_answer(answer)
+        return self._record("assistant", self._call_pregnancy_model(None))
 
-        q = self._call_pregnancy_model(answer)
+    async def asubmit_answer(self, client: httpx.AsyncClient, answer: str) -> Optional[str]:
+        self._record_answer(answer)
+        return self._record("assistant", await self._acall_pregnancy_model(client, None))
 
-        if q:
-            self.conversation_history.append({
-                "role": "assistant",
-                "content": q,
-                "timestamp": datetime.utcnow().isoformat()
-            })
+    def submit_answer_stream(self, answer: str) -> Iterator[str]:
+        """
+        Like submit_answer, but yields the reply chunk by chunk (e.g. for st.write_stream).
+        """
+        self._record_answer(answer)
+        parts = []
+        for chunk in self._stream_pregnancy_model(None):
+            parts.append(chunk)
+            yield chunk
+        self._record("assistant", "".join(parts).strip() or None)
 
-        return q
+    # --------------------------------------------------
+    def generate_pregnancy_report(self) -> Dict[str, Any]:
+        """
+        Ask the model for a closing summary. Kept out of to_json so saving a
+        session never triggers a model call.
+        """
+        # گزارش مانند خلاصه‌سازی همه پیام‌های پس از آخرین خلاصه را می‌بیند، نه فقط پنجره،
+        # و به همین دلیل از کش پاسخ استفاده نمی‌کند
+        body = self._encode_body(_REPORT_PROMPT, turns=self._ollama_history[self._condensed_upto:])
+        summary = self._call_pregnancy_model(
+            _REPORT_PROMPT, detect_status=False, use_cache=False, body=body
+        )
+        return {
+            "session_id": self.session_id,
+            "status": self.status.value,
+            "pregnancy_data": self.to_dict()["pregnancy_data"],
+            "final_summary": summary,
+            "generated_at": to_iso(time.time_ns())
+        }
 
     # --------------------------------------------------
     def get_last_assistant_message(self) -> Optional[str]:
@@ -213,46 +523,70 @@ class PregnancySession:
         return {
             "session_id": self.session_id,
             "status": self.status.value,
-            "pregnancy_data": asdict(self.pregnancy_data),
-            "conversation_history": self.conversation_history,
+            # کپی سطحی فیلدها؛ asdict فهرست علائم و ریسک‌ها را هر بار deep-copy می‌کند
+            "pregnancy_data": {
+                name: getattr(self.pregnancy_data, name) for name in PregnancyData.__slots__
+            },
+            "gyn_summary": self.gyn_summary,
+            "intro_pending": self.intro_pending,
+            "history_summary": self.history_summary,
+            "condensed_upto": self._condensed_upto,
+            "conversation_history": [
+                {**msg, "timestamp": to_iso(msg["timestamp"])}
+                for msg in self.conversation_history
+            ],
             "metadata": self.metadata,
-            "created_at": self.created_at,
-            "updated_at": self.updated_at
+            "created_at": to_iso(self.created_at),
+            "updated_at": to_iso(self.updated_at)
         }
 
     def to_json(self) -> str:
-        return json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+        return dumps_pretty(self.to_dict())
 
     def save_to_file(self, filepath: str) -> None:
-        with open(filepath, "w", encoding="utf-8") as f:
-            f.write(self.to_json())
+        write_json_atomic(filepath, self.to_dict())
 
     # --------------------------------------------------
     @classmethod
     def load_from_file(cls, filepath: str, ollama_base_url: str = "http://localhost:11434"):
-        with open(filepath, "r", encoding="utf-8") as f:
-            data = json.load(f)
+        with open(filepath, "rb") as f:
+            data = orjson.loads(f.read())
 
         session = cls(
             session_id=data["session_id"],
             ollama_base_url=ollama_base_url,
-            pregnancy_model=data.get("metadata", {}).get("model", "deepseek-r1:1.5b")
+            pregnancy_model=data.get("metadata", {}).get("model", PREGNANCY_MODEL_NAME)
         )
 
         session.status = PregnancyStatus(data["status"])
         session.pregnancy_data = PregnancyData(**data.get("pregnancy_data", {}))
-        session.conversation_history = data.get("conversation_history", [])
+        history = data.get("conversation_history", [])
+        session.gyn_summary = data.get("gyn_summary")
+        # فایل‌های قدیمی خلاصه را به صورت پیام system در تاریخچه نگه می‌داشتند
+        if session.gyn_summary is None and history and history[0].get("role") == "system":
+            session.gyn_summary = history[0]["content"]
+        session.conversation_history = [
+            {**m, "timestamp": from_iso(m.get("timestamp"), session.created_at)}
+            for m in history if m.get("role") != "system"
+        ]
+        session._ollama_history = [
+            {"role": m["role"], "content": m.get("prompt", m["content"])}
+            for m in session.conversation_history
+        ]
+        session.intro_pending = data.get("intro_pending", False)
+        session._set_history_summary(data.get("history_summary"), data.get("condensed_upto", 0))
+        session._freeze_prefix()
         session.metadata = data.get("metadata", {})
-        session.created_at = data.get("created_at")
-        session.updated_at = data.get("updated_at")
+        session.created_at = from_iso(data.get("created_at"), session.created_at)
+        session.updated_at = from_iso(data.get("updated_at"), session.updated_at)
 
         return session
 
     # --------------------------------------------------
     @classmethod
     def from_gynecology_session(cls, gyn_session_file: str, ollama_base_url: str):
-        with open(gyn_session_file, "r", encoding="utf-8") as f:
-            gyn_data = json.load(f)
+        with open(gyn_session_file, "rb") as f:
+            gyn_data = orjson.loads(f.read())
 
         new_id = f"pregnancy_{gyn_data['session_id']}"
         return cls(new_id, gynecology_session_data=gyn_data, ollama_base_url=ollama_base_url)
@@ -0,0 +1,17 @@
+"""
+Answer keys for the scripted gynecology intake, in the order they are asked
+"""
+
+QUESTION_KEYS = (
+    "age",
+    "chief_complaint",
+    "lmp",
+    "cycle_regular",
+    "pregnancy_history",
+    "contraception",
+    "current_symptoms",
+    "medical_history",
+    "medications",
+    "surgery_history",
+    "drug_allergy",
+)
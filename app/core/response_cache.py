@@ -0,0 +1,60 @@
+"""
+In-process LRU cache for Ollama chat replies
+"""
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Optional
+
+import orjson
+
+from app.config.settings import RESPONSE_CACHE_SIZE
+
+
+_SPACE_RE = re.compile(r"\s+")
+# Persian and Arabic-Indic digits → ASCII
+_DIGITS = str.maketrans("۰۱۲۳۴۵۶۷۸۹٠١٢٣٤٥٦٧٨٩", "01234567890123456789")
+
+
+def normalize_message(text: str) -> str:
+    """Fold case, whitespace and digit script so trivially different answers share a key."""
+    return _SPACE_RE.sub(" ", text.strip().lower()).translate(_DIGITS)
+
+
+class ResponseCache:
+    """
+    Bounded LRU of assistant replies keyed by a hash of the exact request.
+    Locked because the GUI uses it from its shared event-loop thread and from
+    Streamlit script threads (streamed pregnancy replies) at the same time; the
+    API only touches it on the event loop.
+    """
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(*parts: Any) -> str:
+        return hashlib.sha1(orjson.dumps(parts)).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key: str, value: str) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+
+# Shared by all sessions in the process
+chat_cache = ResponseCache(RESPONSE_CACHE_SIZE)
@@ -0,0 +1,79 @@
+"""
+Optional embedding-based pregnancy status classification for model replies
+"""
+import math
+from typing import Dict, List, Optional
+
+import httpx
+import requests
+
+from app.config.settings import STATUS_EMBED_MIN_SIMILARITY, STATUS_EMBED_MODEL
+from app.core.ollama_client import get_http_session, ollama_slots
+
+
+# Reference sentence per status; category names match the lexical keyword groups
+_LABELS = (
+    ("confirmed", "بارداری تایید شد"),
+    ("test", "نیاز به آزمایش بتا"),
+    ("ruled_out", "بارداری رد شد"),
+)
+
+# Label embeddings per Ollama server, filled by the first classification
+_label_vectors: Dict[str, List[List[float]]] = {}
+
+
+def _cosine(a: List[float], b: List[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+def _embed_payload(base_url: str, text: str) -> dict:
+    # the labels ride along with the first text, so it takes one /api/embed call either way
+    inputs = [text] if base_url in _label_vectors else [label for _, label in _LABELS] + [text]
+    return {"model": STATUS_EMBED_MODEL, "input": inputs}
+
+
+def _pick(base_url: str, embeddings: List[List[float]]) -> Optional[str]:
+    if base_url not in _label_vectors:
+        _label_vectors[base_url] = embeddings[:-1]
+    query = embeddings[-1]
+    score, category = max(
+        (_cosine(vector, query), category)
+        for (category, _), vector in zip(_LABELS, _label_vectors[base_url])
+    )
+    return category if score >= STATUS_EMBED_MIN_SIMILARITY else None
+
+
+def classify_status(base_url: str, text: str) -> Optional[str]:
+    """
+    Closest status category for text, or None when disabled, unsure or unreachable
+    (callers then fall back to keyword matching).
+    """
+    if not STATUS_EMBED_MODEL:
+        return None
+    try:
+        response = get_http_session().post(
+            f"{base_url}/api/embed", json=_embed_payload(base_url, text), timeout=10
+        )
+        response.raise_for_status()
+        return _pick(base_url, response.json()["embeddings"])
+    except (requests.exceptions.RequestException, KeyError, ValueError) as e:
+        print(f"Status embedding error: {e}")
+        return None
+
+
+async def aclassify_status(client: httpx.AsyncClient, base_url: str, text: str) -> Optional[str]:
+    """Async variant of classify_status using the shared client."""
+    if not STATUS_EMBED_MODEL:
+        return None
+    try:
+        async with ollama_slots():
+            response = await client.post(
+                f"{base_url}/api/embed", json=_embed_payload(base_url, text), timeout=10
+            )
+        response.raise_for_status()
+        return _pick(base_url, response.json()["embeddings"])
+    except (httpx.HTTPError, KeyError, ValueError) as e:
+        print(f"Status embedding error: {e}")
+        return None
@@ -0,0 +1,25 @@
+"""
+Timestamp helpers: sessions keep time.time_ns() integers and format them only on export
+"""
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Union
+
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+def to_iso(ns: int) -> str:
+    """Format epoch nanoseconds like datetime.utcnow().isoformat()."""
+    return (_EPOCH + timedelta(microseconds=ns // 1000)).isoformat()
+
+
+def from_iso(value: Union[str, int, None], default: Optional[int] = None) -> Optional[int]:
+    """Parse a stored ISO timestamp back to epoch nanoseconds."""
+    if value is None:
+        return default
+    if isinstance(value, int):
+        return value
+    dt = datetime.fromisoformat(value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return (dt - _EPOCH) // timedelta(microseconds=1) * 1000
@@ -1,20 +1,8 @@
 import uuid
 from app.core.gynecology_session import GynecologySession
+from app.core.question_keys import QUESTION_KEYS
 from app.config.settings import SESSION_DIR
 
-QUESTION_KEYS = [
-    "age",
-    "chief_complaint",
-    "lmp",
-    "cycle_regular",
-    "pregnancy_history",
-    "contraception",
-    "current_symptoms",
-    "medical_history",
-    "medications",
-    "surgery_history",
-    "drug_allergy"
-]
 
 def run_cli():
     session_id = f"patient_{uuid.uuid4().hex[:8]}"
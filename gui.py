@@ -1,3 +1,6 @@
+import asyncio
+import threading
+import httpx
 import streamlit as st
 from pathlib import Path
 from app.core.gynecology_session import GynecologySession
@@ -18,11 +21,31 @@ for key in ["gyne_answer", "preg_answer"]:
 
 st.title("سیستم مشاوره زنان و بارداری 🤰")
 
+# یک event loop و کلاینت HTTP مشترک برای همه تب‌ها و بیماران این worker؛
+# کلاینت async به loop خودش وابسته است، پس loop هم باید ماندگار باشد
+@st.cache_resource
+def get_ollama_runtime():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    client = httpx.AsyncClient(
+        timeout=45,
+        limits=httpx.Limits(max_keepalive_connections=40, max_connections=100)
+    )
+    return loop, client
+
+# اجرای فراخوانی‌های async مدل روی loop مشترک
+def run_async(fn):
+    loop, client = get_ollama_runtime()
+    return asyncio.run_coroutine_threadsafe(fn(client), loop).result()
+
 # شروع جلسه زنان
 def start_gynecology_session():
     import uuid
     session_id = f"patient_{uuid.uuid4().hex[:8]}"
-    session = GynecologySession(session_id=session_id, ollama_base_url=OLLAMA_BASE_URL)
+    session = GynecologySession(
+        session_id=session_id, ollama_base_url=OLLAMA_BASE_URL, start_conversation=False
+    )
+    run_async(session.ainitialize_conversation)
     st.session_state.current_session = session
     st.session_state.last_question = session.get_current_question()
     st.rerun()  # ریفرش صفحه بعد از ایجاد جلسه
@@ -30,22 +53,34 @@ def start_gynecology_session():
 # ارسال پاسخ
 def submit_answer(answer: str):
     session = st.session_state.current_session
-    next_question = session.submit_answer(f"q{len(session.patient_answers)+1}", answer)
+    # _turn روی thread رویداد مشترک اجرا می‌شود و به st.session_state دسترسی ندارد
+    in_pregnancy = st.session_state.in_pregnancy
 
-    if session.pregnancy_suspicion and not st.session_state.in_pregnancy:
-        st.session_state.in_pregnancy = True
-        # ذخیره جلسه زنان
+    async def _turn(client):
+        next_question = await session.asubmit_answer(
+            client, f"q{len(session.patient_answers)+1}", answer
+        )
+        if not session.pregnancy_suspicion or in_pregnancy:
+            return next_question, None
+
+        # ذخیره جلسه زنان و ایجاد خودکار جلسه بارداری
         gyn_file = SESSION_DIR / f"{session.session_id}.json"
-        session.save_to_file(str(gyn_file))
-        # ایجاد خودکار جلسه بارداری
-        st.session_state.pregnancy_session = PregnancySession.from_gynecology_session(
-            gyn_session_file=str(gyn_file),
+        pregnancy_session = PregnancySession(
+            f"pregnancy_{session.session_id}",
+            gynecology_session_data=session.to_dict(),
             ollama_base_url=OLLAMA_BASE_URL
         )
+        await asyncio.to_thread(session.save_to_file, str(gyn_file))
+        # مقدمه همراه اولین پاسخ بیمار به مدل می‌رود؛ فراخوانی جداگانه لازم نیست
+        return pregnancy_session.defer_start(), pregnancy_session
+
+    next_question, pregnancy_session = run_async(_turn)
+
+    if pregnancy_session:
+        st.session_state.in_pregnancy = True
+        st.session_state.pregnancy_session = pregnancy_session
         st.session_state.current_session = None
-        st.session_state.last_question = st.session_state.pregnancy_session.start()
-    else:
-        st.session_state.last_question = next_question
+    st.session_state.last_question = next_question
 
     # ریفرش صفحه برای پاک کردن ورودی
     st.rerun()
@@ -72,8 +107,11 @@ elif st.session_state.in_pregnancy:
     )
     if st.button("ارسال پاسخ به مشاوره بارداری"):
         if st.session_state.preg_answer.strip():
-            session.submit_answer(st.session_state.preg_answer.strip())
-            st.session_state.last_question = session.get_current_question()
+            # نمایش تدریجی پاسخ مدل به محض رسیدن توکن‌ها
+            st.write_stream(session.submit_answer_stream(st.session_state.preg_answer.strip()))
+            st.session_state.last_question = session.get_last_assistant_message()
+            # پاسخ نمایش داده شده؛ خلاصه‌سازی تاریخچه پس از آن انجام می‌شود
+            session.condense_if_needed()
             st.rerun()
 
 else:
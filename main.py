@@ -1,8 +1,14 @@
 """
 Main application entry point (API)
 """
+import asyncio
+import os
+
+import httpx
 from fastapi import FastAPI
-from app.api.routes import router
+from app.api.routes import router, SESSIONS_DIR
+from app.config.settings import OLLAMA_BASE_URL, OLLAMA_KEEP_ALIVE, PREGNANCY_MODEL_NAME
+from app.core.gynecology_session import DEFAULT_MODEL_NAME
 
 app = FastAPI(
     title="Medical Gynecology & Pregnancy AI",
@@ -12,6 +18,46 @@ app = FastAPI(
 
 app.include_router(router)
 
+
+async def _warm_model(client: httpx.AsyncClient, model: str) -> None:
+    # a chat request with no messages only loads the model; keep_alive pins it in memory
+    try:
+        response = await client.post(
+            f"{OLLAMA_BASE_URL}/api/chat",
+            json={"model": model, "messages": [], "keep_alive": OLLAMA_KEEP_ALIVE}
+        )
+        response.raise_for_status()
+    except httpx.HTTPError as e:
+        print(f"Model warm-up failed for {model}: {e}")
+
+
+@app.on_event("startup")
+async def startup():
+    os.makedirs(SESSIONS_DIR, exist_ok=True)
+
+    # One pooled client shared by all requests so Ollama calls overlap on the event loop
+    app.state.http = httpx.AsyncClient(
+        timeout=httpx.Timeout(300, connect=10),
+        limits=httpx.Limits(
+            max_keepalive_connections=40,
+            max_connections=100,
+            keepalive_expiry=30
+        )
+    )
+
+    # load both models in the background so the first patient does not pay for it
+    app.state.warmup = asyncio.gather(
+        _warm_model(app.state.http, DEFAULT_MODEL_NAME),
+        _warm_model(app.state.http, PREGNANCY_MODEL_NAME)
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    app.state.warmup.cancel()
+    await app.state.http.aclose()
+
+
 @app.get("/")
 def root():
     return {
@@ -1,12 +1,17 @@
 #!/bin/bash
 
-echo "Setting up Ollama model for gynecology consultation..."
+echo "Setting up Ollama models for gynecology and pregnancy consultation..."
+
+# Same names and defaults as app/config/settings.py
+MODEL_NAME="${MODEL_NAME:-gemma3-medical}"
+PREGNANCY_MODEL_NAME="${PREGNANCY_MODEL_NAME:-pregnancy-assistant:latest}"
 
 # Navigate to models directory
 cd "$(dirname "$0")/../app/models"
 
-# Create the custom model
-ollama create gemma3-medical -f Modelfile
+# Create the custom models
+ollama create "$MODEL_NAME" -f Modelfile
+ollama create "$PREGNANCY_MODEL_NAME" -f pregnancy/Modelfile
 
 # Verify creation
 echo ""
@@ -14,4 +19,4 @@ echo "Available models:"
 ollama list
 
 echo ""
-echo "Model setup complete! You can now run: python main.py"
\ No newline at end of file
+echo "Model setup complete! You can now run: python main.py"
@@ -0,0 +1,33 @@
+import unittest
+
+from app.core.response_cache import ResponseCache, normalize_message
+
+
+class ResponseCacheTests(unittest.TestCase):
+    def test_least_recently_used_entry_is_evicted(self):
+        cache = ResponseCache(maxsize=2)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        self.assertEqual(cache.get("a"), "1")  # "b" is now the oldest
+        cache.put("c", "3")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "1")
+        self.assertEqual(cache.get("c"), "3")
+
+    def test_zero_size_stores_nothing(self):
+        cache = ResponseCache(maxsize=0)
+        cache.put("a", "1")
+        self.assertIsNone(cache.get("a"))
+
+    def test_make_key_depends_on_every_part(self):
+        key = ResponseCache.make_key("model", [{"role": "user", "content": "x"}])
+        self.assertEqual(key, ResponseCache.make_key("model", [{"role": "user", "content": "x"}]))
+        self.assertNotEqual(key, ResponseCache.make_key("model", [{"role": "user", "content": "y"}]))
+
+    def test_normalize_message(self):
+        self.assertEqual(normalize_message("  بله   ۲ ماه\n"), "بله 2 ماه")
+        self.assertEqual(normalize_message("YES"), "yes")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,344 @@
+import asyncio
+import os
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+import httpx
+import orjson
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.api import routes
+from app.core.gynecology_session import SessionStatus
+from app.core.pregnancy_session import _CONDENSE_PROMPT
+from app.core.response_cache import chat_cache
+
+
+class FakeOllama:
+    """Answers /api/chat like Ollama does, streaming or not, and records every request."""
+
+    def __init__(self):
+        self.requests = []
+
+    def reply_for(self, n: int) -> str:
+        return f"سوال شماره {n}"
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        body = orjson.loads(request.content)
+        self.requests.append(body)
+        reply = self.reply_for(len(self.requests))
+        if not body.get("stream"):
+            return httpx.Response(200, json={"message": {"role": "assistant", "content": reply}})
+        words = reply.split(" ")
+        lines = [
+            orjson.dumps({"message": {"content": w + (" " if i < len(words) - 1 else "")}})
+            for i, w in enumerate(words)
+        ]
+        return httpx.Response(200, content=b"\n".join(lines) + b"\n")
+
+
+class SlowOllama(FakeOllama):
+    """Yields to the event loop before answering, so concurrent requests can interleave."""
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(0.01)
+        return super().__call__(request)
+
+
+def sse_events(text: str):
+    return [orjson.loads(line[len("data: "):]) for line in text.splitlines() if line.startswith("data: ")]
+
+
+async def drain_background_tasks() -> None:
+    while routes._background_tasks:
+        await asyncio.gather(*list(routes._background_tasks))
+
+
+class RouteTestCase(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.sessions_dir = tmp.name
+        patcher = mock.patch.object(routes, "SESSIONS_DIR", self.sessions_dir)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        routes.SESSION_CACHE.clear()
+        self.addCleanup(routes.SESSION_CACHE.clear)
+        chat_cache._data.clear()
+
+        self.ollama = FakeOllama()
+        self.app = app = FastAPI()
+        app.include_router(routes.router)
+        app.state.http = httpx.AsyncClient(transport=httpx.MockTransport(self.ollama))
+        self.client = TestClient(app)
+        self.client.__enter__()
+        self.addCleanup(self.client.__exit__, None, None, None)
+
+    def drain(self) -> None:
+        self.client.portal.call(drain_background_tasks)
+
+    def saved(self, session_id: str) -> dict:
+        with open(os.path.join(self.sessions_dir, f"{session_id}.json"), "rb") as f:
+            return orjson.loads(f.read())
+
+    def start(self, session_id: str = "patient_1") -> dict:
+        response = self.client.post("/api/gynecology/start", json={"session_id": session_id})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def message(self, session_id: str, text: str) -> httpx.Response:
+        return self.client.post(f"/api/gynecology/{session_id}/message", json={"message": text})
+
+
+class ConsultationFlowTests(RouteTestCase):
+    def test_start_messages_transfer_and_pregnancy_message(self):
+        started = self.start()
+        self.assertEqual(started, {"session_id": "patient_1", "question": "سوال شماره 1"})
+
+        for i, answer in enumerate(("۳۰ سال", "تهوع دارم", "از دو ماه پیش"), 2):
+            response = self.message("patient_1", answer)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.headers["content-type"], "text/event-stream; charset=utf-8")
+            events = sse_events(response.text)
+            self.assertEqual("".join(e["content"] for e in events[:-1]), f"سوال شماره {i}")
+            self.assertEqual(events[-1]["reply"], f"سوال شماره {i}")
+        self.assertTrue(events[-1]["pregnancy_suspicion"])
+
+        response = self.client.post("/api/gynecology/patient_1/transfer")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {
+            "pregnancy_session_id": "pregnancy_patient_1", "first_question": "سوال شماره 5"
+        })
+
+        response = self.client.post(
+            "/api/pregnancy/pregnancy_patient_1/message", json={"message": "آزمایش ندادم"}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["reply"], "سوال شماره 6")
+
+        self.drain()
+        gyn = self.saved("patient_1")
+        self.assertEqual(len(gyn["conversation_history"]), 7)
+        self.assertTrue(gyn["pregnancy_suspicion"])
+        pregnancy = self.saved("pregnancy_patient_1")
+        self.assertEqual(
+            [m["content"] for m in pregnancy["conversation_history"]],
+            ["سوال شماره 5", "آزمایش ندادم", "سوال شماره 6"]
+        )
+
+
+class ValidationTests(RouteTestCase):
+    def test_session_ids_are_limited_to_a_safe_character_set(self):
+        for bad in ("../etc/passwd", "", "a" * 65, "bad id", 123):
+            response = self.client.post("/api/gynecology/start", json={"session_id": bad})
+            self.assertEqual(response.status_code, 422, bad)
+        self.assertEqual(os.listdir(self.sessions_dir), [])
+        self.assertEqual(self.ollama.requests, [])
+
+    def test_unknown_fields_are_rejected(self):
+        response = self.client.post(
+            "/api/gynecology/start", json={"session_id": "patient_1", "model": "x"}
+        )
+        self.assertEqual(response.status_code, 422)
+
+    def test_messages_must_be_non_blank_and_bounded(self):
+        self.start()
+        for bad in ({"message": "   "}, {"message": "ا" * 4097}, {}, {"text": "سلام"}):
+            response = self.client.post("/api/gynecology/patient_1/message", json=bad)
+            self.assertEqual(response.status_code, 422, bad)
+        self.assertEqual(len(self.ollama.requests), 1)
+
+    def test_messages_are_stripped(self):
+        self.start()
+        self.message("patient_1", "  ۳۰ سال \n")
+        self.assertEqual(self.ollama.requests[-1]["messages"][-1], {"role": "user", "content": "۳۰ سال"})
+
+
+class NotFoundTests(RouteTestCase):
+    def test_unknown_sessions_are_404(self):
+        cases = [
+            ("/api/gynecology/nobody/message", {"message": "سلام"}, "Session not found"),
+            ("/api/gynecology/nobody/transfer", None, "Gynecology session not found"),
+            ("/api/pregnancy/nobody/message", {"message": "سلام"}, "Pregnancy session not found"),
+        ]
+        for url, body, detail in cases:
+            response = self.client.post(url, json=body)
+            self.assertEqual(response.status_code, 404, url)
+            self.assertEqual(response.json(), {"detail": detail})
+        self.assertEqual(routes.SESSION_CACHE, {})
+        self.assertEqual(self.ollama.requests, [])
+
+    def test_sessions_on_disk_are_loaded_on_demand(self):
+        self.start()
+        self.drain()
+        routes.SESSION_CACHE.clear()
+
+        response = self.message("patient_1", "۳۰ سال")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(self.ollama.requests[-1]["messages"]), 4)
+
+
+
+class SessionCacheTests(RouteTestCase):
+    def test_least_recently_used_session_is_evicted(self):
+        with mock.patch.object(routes, "SESSION_CACHE_SIZE", 2):
+            self.start("patient_1")
+            self.start("patient_2")
+            self.message("patient_1", "۳۰ سال")
+            self.start("patient_3")
+        self.assertEqual(
+            list(routes.SESSION_CACHE),
+            [("GynecologySession", "patient_1"), ("GynecologySession", "patient_3")]
+        )
+
+    def test_concurrent_loads_share_one_entry(self):
+        self.start()
+        self.drain()
+        routes.SESSION_CACHE.clear()
+
+        async def load_twice():
+            return await asyncio.gather(*(
+                routes._get_session(routes.GynecologySession, "patient_1", "Session not found")
+                for _ in range(2)
+            ))
+
+        (first, first_lock), (second, second_lock) = self.client.portal.call(load_twice)
+        self.assertIs(first, second)
+        self.assertIs(first_lock, second_lock)
+
+    def test_concurrent_messages_to_one_session_are_applied_in_turn(self):
+        self.ollama = SlowOllama()
+        self.app.state.http = httpx.AsyncClient(transport=httpx.MockTransport(self.ollama))
+        self.start()
+
+        async def send_both():
+            transport = httpx.ASGITransport(app=self.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as api:
+                return await asyncio.gather(*(
+                    api.post("/api/gynecology/patient_1/message", json={"message": text})
+                    for text in ("۳۰ سال", "درد دارم")
+                ))
+
+        responses = self.client.portal.call(send_both)
+        self.assertEqual([r.status_code for r in responses], [200, 200])
+        self.drain()
+
+        history = self.saved("patient_1")["conversation_history"]
+        self.assertEqual(
+            [m["role"] for m in history], ["assistant", "user", "assistant", "user", "assistant"]
+        )
+        # the second request saw the first one's complete turn
+        self.assertEqual(
+            [m["content"] for m in self.ollama.requests[-1]["messages"][2:]],
+            [m["content"] for m in history[:4]]
+        )
+
+
+
+class GynecologyStreamTests(RouteTestCase):
+    def test_reply_is_streamed_as_server_sent_events(self):
+        self.start()
+        response = self.message("patient_1", "۳۰ سال")
+        self.assertTrue(response.text.startswith("data: "))
+        self.assertTrue(response.text.endswith("\n\n"))
+        events = sse_events(response.text)
+        self.assertEqual(events[:-1], [{"content": "سوال "}, {"content": "شماره "}, {"content": "2"}])
+        self.assertEqual(events[-1], {"done": True, "reply": "سوال شماره 2", "pregnancy_suspicion": False})
+        self.assertTrue(self.ollama.requests[-1]["stream"])
+
+    def test_inactive_session_is_409_before_streaming(self):
+        self.start()
+        session, _ = routes.SESSION_CACHE[("GynecologySession", "patient_1")]
+        session.status = SessionStatus.COMPLETED
+
+        response = self.message("patient_1", "۳۰ سال")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), {"detail": "Session is not active. Status: completed"})
+        self.assertEqual(len(self.ollama.requests), 1)
+
+    def test_session_ended_while_queued_gets_an_error_event(self):
+        self.start()
+        session, lock = routes.SESSION_CACHE[("GynecologySession", "patient_1")]
+
+        async def send_while_locked():
+            transport = httpx.ASGITransport(app=self.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as api:
+                async with lock:
+                    pending = asyncio.create_task(
+                        api.post("/api/gynecology/patient_1/message", json={"message": "۳۰ سال"})
+                    )
+                    await asyncio.sleep(0.05)
+                    session.status = SessionStatus.COMPLETED
+                return await pending
+
+        response = self.client.portal.call(send_while_locked)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            sse_events(response.text), [{"error": "Session is not active. Status: completed"}]
+        )
+        self.assertEqual(len(self.ollama.requests), 1)
+        self.assertNotIn("free_text", session.patient_answers)
+
+    def test_disconnect_mid_reply_still_records_and_saves_the_turn(self):
+        self.start()
+        self.drain()
+        request = SimpleNamespace(app=self.app)
+
+        async def read_one_chunk_then_disconnect():
+            response = await routes.gynecology_message(
+                "patient_1", routes.MessageRequest(message="۳۰ سال"), request
+            )
+            events = response.body_iterator
+            first = await events.__anext__()
+            # Starlette closes the body iterator when the client goes away
+            await events.aclose()
+            await drain_background_tasks()
+            return first
+
+        first = self.client.portal.call(read_one_chunk_then_disconnect)
+        self.assertEqual(sse_events(first), [{"content": "سوال "}])
+
+        session, lock = routes.SESSION_CACHE[("GynecologySession", "patient_1")]
+        self.assertFalse(lock.locked())
+        self.assertEqual(session.get_current_question(), "سوال")
+        history = self.saved("patient_1")["conversation_history"]
+        self.assertEqual([m["content"] for m in history[1:]], ["۳۰ سال", "سوال"])
+
+
+class PregnancyCondenseTests(RouteTestCase):
+    def test_reply_is_returned_before_the_history_is_condensed(self):
+        self.start()
+        self.client.post("/api/gynecology/patient_1/transfer")
+        session, _ = routes.SESSION_CACHE[("PregnancySession", "pregnancy_patient_1")]
+        long_text = "ا" * (session.CONDENSE_THRESHOLD_CHARS // 10)
+        for i in range(20):
+            session._record("user" if i % 2 else "assistant", long_text)
+        calls_before = len(self.ollama.requests)
+
+        response = self.client.post(
+            "/api/pregnancy/pregnancy_patient_1/message", json={"message": "آزمایش ندادم"}
+        )
+        self.assertEqual(response.status_code, 200)
+        reply_number = calls_before + 1
+        self.assertEqual(response.json()["reply"], f"سوال شماره {reply_number}")
+        self.drain()
+
+        reply_request, condense_request = self.ollama.requests[calls_before:]
+        self.assertEqual(reply_request["messages"][-1]["content"], "آزمایش ندادم")
+        self.assertEqual(condense_request["messages"][-1]["content"], _CONDENSE_PROMPT)
+        # every pending turn goes to the condenser, including the new reply
+        self.assertEqual(
+            condense_request["messages"][-2]["content"], f"سوال شماره {reply_number}"
+        )
+
+        saved = self.saved("pregnancy_patient_1")
+        self.assertEqual(saved["history_summary"], f"سوال شماره {reply_number + 1}")
+        self.assertEqual(
+            saved["condensed_upto"], len(saved["conversation_history"]) - session.CONDENSE_KEEP
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,310 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import orjson
+
+from app.config.settings import MAX_HISTORY_TURNS, OLLAMA_KEEP_ALIVE
+from app.core.gynecology_session import GynecologySession
+from app.core.pregnancy_session import PregnancySession, _keyword_categories
+from app.core.timestamps import from_iso, to_iso
+
+
+def _gyn_session(session_id: str = "patient_test") -> GynecologySession:
+    return GynecologySession(session_id, start_conversation=False)
+
+
+def _legacy_gyn_data(**overrides):
+    # shape of a file written before timestamps were stored as integers
+    data = {
+        "session_id": "patient_legacy",
+        "status": "active",
+        "patient_answers": {
+            "q1": {"answer": "۳۰ سال", "timestamp": "2024-05-01T10:00:00.123456"},
+        },
+        "conversation_history": [
+            {"role": "assistant", "content": "سن شما؟", "timestamp": "2024-05-01T09:59:58"},
+        ],
+        "pregnancy_suspicion": False,
+        "metadata": {"model": "gemma3-medical"},
+        "created_at": "2024-05-01T09:59:50",
+        "updated_at": "2024-05-01T10:00:00.123456",
+    }
+    data.update(overrides)
+    return data
+
+
+class TimestampTests(unittest.TestCase):
+    def test_iso_round_trip_keeps_microseconds(self):
+        ns = 1714557600123456789
+        self.assertEqual(from_iso(to_iso(ns)), ns // 1000 * 1000)
+
+    def test_from_iso_passes_through_ints_and_defaults(self):
+        self.assertEqual(from_iso(42), 42)
+        self.assertEqual(from_iso(None, 7), 7)
+
+    def test_from_iso_converts_aware_values_to_utc(self):
+        self.assertEqual(
+            from_iso("2024-05-01T12:30:00+02:00"), from_iso("2024-05-01T10:30:00")
+        )
+
+
+class GynecologyPersistenceTests(unittest.TestCase):
+    def test_round_trip(self):
+        session = _gyn_session()
+        session.patient_answers["q1"] = {"answer": "۲۵", "timestamp": 1714557600123456000}
+
+        data = orjson.loads(orjson.dumps(session.to_dict()))
+        self.assertIsInstance(data["created_at"], str)
+        self.assertIsInstance(data["patient_answers"]["q1"]["timestamp"], str)
+
+        restored = GynecologySession.from_dict(data)
+        self.assertEqual(restored.patient_answers, session.patient_answers)
+        self.assertEqual(restored.created_at, session.created_at // 1000 * 1000)
+
+    def test_legacy_file_timestamps_become_ns(self):
+        restored = GynecologySession.from_dict(_legacy_gyn_data())
+        self.assertEqual(
+            restored.patient_answers["q1"]["timestamp"], from_iso("2024-05-01T10:00:00.123456")
+        )
+        self.assertEqual(restored.created_at, from_iso("2024-05-01T09:59:50"))
+        self.assertIsInstance(restored.conversation_history[0].timestamp, int)
+        self.assertEqual(restored.get_current_question(), "سن شما؟")
+
+    def test_legacy_age_checked_marker(self):
+        data = _legacy_gyn_data()
+        self.assertTrue(GynecologySession.from_dict(data)._awaiting_age)
+
+        data["patient_answers"]["_age_checked"] = True
+        self.assertFalse(GynecologySession.from_dict(data)._awaiting_age)
+
+    def test_awaiting_age_round_trip(self):
+        session = _gyn_session()
+        session._awaiting_age = False
+        self.assertFalse(GynecologySession.from_dict(session.to_dict())._awaiting_age)
+
+    def test_symptom_and_timing_may_come_in_different_answers(self):
+        session = _gyn_session()
+        session._detect_pregnancy("تهوع دارم")
+        self.assertFalse(session.pregnancy_suspicion)
+        session._detect_pregnancy("از دو ماه پیش")
+        self.assertTrue(session.pregnancy_suspicion)
+
+    def test_symptom_flags_round_trip(self):
+        session = _gyn_session()
+        session._detect_pregnancy("تهوع دارم")
+
+        restored = GynecologySession.from_dict(session.to_dict())
+        self.assertTrue(restored._symptoms_seen)
+        self.assertFalse(restored._months_seen)
+        restored._detect_pregnancy("دو ماه")
+        self.assertTrue(restored.pregnancy_suspicion)
+
+    def test_legacy_file_rebuilds_symptom_flags(self):
+        data = _legacy_gyn_data()
+        data["patient_answers"]["q2"] = {"answer": "دو ماه", "timestamp": "2024-05-01T10:01:00"}
+        restored = GynecologySession.from_dict(data)
+        self.assertTrue(restored._months_seen)
+        self.assertFalse(restored.pregnancy_suspicion)
+
+    def test_save_and_load_file(self):
+        session = _gyn_session()
+        session.patient_answers["q1"] = {"answer": "۲۵", "timestamp": 1714557600123456000}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "session.json")
+            session.save_to_file(path)
+            # the temp file is swapped in, never left behind
+            self.assertEqual(os.listdir(tmp), ["session.json"])
+            restored = GynecologySession.load_from_file(path)
+        self.assertEqual(restored.to_dict(), session.to_dict())
+
+
+class WindowTests(unittest.TestCase):
+    @staticmethod
+    def _turns(n):
+        # the model's opening question comes first, then user/assistant alternate
+        return [
+            {"role": "assistant" if i % 2 == 0 else "user", "content": str(i)} for i in range(n)
+        ]
+
+    def test_short_history_is_untouched(self):
+        turns = self._turns(MAX_HISTORY_TURNS)
+        self.assertIs(GynecologySession._window(turns), turns)
+
+    def test_window_fits_and_starts_on_an_assistant_turn(self):
+        for limit in (MAX_HISTORY_TURNS, 26, 7, 3, 2):
+            with mock.patch("app.core.gynecology_session.MAX_HISTORY_TURNS", limit):
+                for n in range(limit + 1, limit * 3 + 2):
+                    window = GynecologySession._window(self._turns(n))
+                    self.assertLessEqual(len(window), limit, (limit, n))
+                    self.assertEqual(window[-1]["content"], str(n - 1))
+                    self.assertEqual(window[0]["role"], "assistant", (limit, n))
+
+    def test_window_start_moves_in_blocks(self):
+        step = max(MAX_HISTORY_TURNS // 2 & ~1, 2)
+        starts = {
+            GynecologySession._window(self._turns(n))[0]["content"]
+            for n in range(MAX_HISTORY_TURNS + 1, MAX_HISTORY_TURNS + step + 1)
+        }
+        self.assertEqual(len(starts), 1)
+
+
+class PregnancyPersistenceTests(unittest.TestCase):
+    def _round_trip(self, data):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "pregnancy.json")
+            with open(path, "wb") as f:
+                f.write(orjson.dumps(data))
+            return PregnancySession.load_from_file(path)
+
+    def test_round_trip(self):
+        session = PregnancySession("pregnancy_test")
+        session._record("assistant", "سلام")
+        session._record("user", "تهوع دارم")
+
+        data = session.to_dict()
+        self.assertIsInstance(data["conversation_history"][0]["timestamp"], str)
+
+        restored = self._round_trip(data)
+        self.assertEqual(restored.conversation_history, [
+            {**m, "timestamp": m["timestamp"] // 1000 * 1000}
+            for m in session.conversation_history
+        ])
+        self.assertEqual(restored._ollama_history, session._ollama_history)
+        self.assertEqual(restored.created_at, session.created_at // 1000 * 1000)
+
+    def test_gyn_summary_is_sent_as_frozen_prefix(self):
+        session = PregnancySession("pregnancy_test")
+        session.gyn_summary = "خلاصه جلسه زنان"
+        session._freeze_prefix()
+
+        restored = self._round_trip(session.to_dict())
+        self.assertEqual(restored.gyn_summary, "خلاصه جلسه زنان")
+        messages = orjson.loads(restored._encode_body("سلام"))["messages"]
+        self.assertEqual(
+            messages[:2],
+            [{"role": "system", "content": restored.system_prompt},
+             {"role": "system", "content": "خلاصه جلسه زنان"}]
+        )
+
+    def test_legacy_system_message_becomes_gyn_summary(self):
+        data = PregnancySession("pregnancy_test").to_dict()
+        del data["gyn_summary"]
+        data["conversation_history"] = [
+            {"role": "system", "content": "خلاصه قدیمی", "timestamp": "2024-05-01T10:00:00"},
+            {"role": "assistant", "content": "سلام", "timestamp": "2024-05-01T10:00:01"},
+        ]
+
+        restored = self._round_trip(data)
+        self.assertEqual(restored.gyn_summary, "خلاصه قدیمی")
+        self.assertEqual([m["role"] for m in restored.conversation_history], ["assistant"])
+        self.assertEqual(restored.get_last_assistant_message(), "سلام")
+
+    def test_deferred_intro_prompt_survives_reload(self):
+        session = PregnancySession("pregnancy_test")
+        session.defer_start()
+        self.assertTrue(self._round_trip(session.to_dict()).intro_pending)
+
+        session._record_answer("دو هفته تاخیر دارم")
+        self.assertFalse(session.intro_pending)
+        sent = session._ollama_history[-1]["content"]
+        self.assertNotEqual(sent, "دو هفته تاخیر دارم")
+        self.assertEqual(session.conversation_history[-1]["content"], "دو هفته تاخیر دارم")
+
+        restored = self._round_trip(session.to_dict())
+        self.assertFalse(restored.intro_pending)
+        self.assertEqual(restored._ollama_history[-1]["content"], sent)
+    def test_history_summary_survives_reload(self):
+        session = PregnancySession("pregnancy_test")
+        for i in range(10):
+            session._record("user" if i % 2 else "assistant", f"پیام {i}")
+        self.assertTrue(session._apply_condense("خلاصه", 4))
+
+        restored = self._round_trip(session.to_dict())
+        self.assertEqual(restored.history_summary, "خلاصه")
+        self.assertEqual(restored._condensed_upto, 4)
+        self.assertEqual(restored._encoded_summary, session._encoded_summary)
+
+    def test_condense_request_covers_every_pending_turn(self):
+        session = PregnancySession("pregnancy_test")
+        for i in range(40):
+            session._record("user" if i % 2 else "assistant", f"پیام {i}")
+        session._set_history_summary("خلاصه", 4)
+
+        upto, body = session._condense_request()
+        self.assertEqual(upto, 40 - session.CONDENSE_KEEP)
+        contents = [m["content"] for m in orjson.loads(body)["messages"]]
+        self.assertIn("پیام 4", contents)
+        self.assertIn("پیام 39", contents)
+        self.assertNotIn("پیام 3", contents)
+
+    def test_report_covers_every_pending_turn(self):
+        session = PregnancySession("pregnancy_test")
+        for i in range(40):
+            session._record("user" if i % 2 else "assistant", f"پیام {i}")
+        session._set_history_summary("خلاصه", 4)
+
+        http = mock.Mock()
+        http.post.return_value.json.return_value = {"message": {"content": "گزارش"}}
+        with mock.patch("app.core.pregnancy_session.get_http_session", return_value=http):
+            report = session.generate_pregnancy_report()
+
+        self.assertEqual(report["final_summary"], "گزارش")
+        contents = [m["content"] for m in orjson.loads(http.post.call_args.kwargs["data"])["messages"]]
+        self.assertIn("پیام 4", contents)
+        self.assertNotIn("پیام 3", contents)
+        self.assertEqual(len(session._ollama_history), 40)
+
+    def test_condense_if_needed(self):
+        session = PregnancySession("pregnancy_test")
+        session._record("assistant", "سلام")
+        http = mock.Mock()
+        http.post.return_value.json.return_value = {"message": {"content": "خلاصه"}}
+        with mock.patch("app.core.pregnancy_session.get_http_session", return_value=http):
+            self.assertFalse(session.condense_if_needed())
+            http.post.assert_not_called()
+
+            long_text = "ا" * (session.CONDENSE_THRESHOLD_CHARS // 10)
+            for i in range(20):
+                session._record("user" if i % 2 else "assistant", long_text)
+            self.assertTrue(session.condense_if_needed())
+
+        self.assertEqual(session.history_summary, "خلاصه")
+        self.assertEqual(session._condensed_upto, 21 - session.CONDENSE_KEEP)
+        self.assertEqual(len(session.conversation_history), 21)
+
+
+
+class KeepAliveTests(unittest.TestCase):
+    def test_chat_requests_keep_the_warm_up_residency(self):
+        # a shorter keep_alive on a chat request would cut the warm-up's back
+        gyn_body = _gyn_session()._encode_body([], stream=False)
+        pregnancy_body = PregnancySession("pregnancy_test")._encode_body("سلام")
+        self.assertEqual(orjson.loads(gyn_body)["keep_alive"], OLLAMA_KEEP_ALIVE)
+        self.assertEqual(orjson.loads(pregnancy_body)["keep_alive"], OLLAMA_KEEP_ALIVE)
+
+
+class KeywordTests(unittest.TestCase):
+    def test_keyword_categories(self):
+        self.assertEqual(_keyword_categories("تاخیر در قاعدگی"), {"symptom", "lmp"})
+        self.assertEqual(_keyword_categories("Test NEGATIVE"), {"test", "ruled_out"})
+        self.assertEqual(_keyword_categories("جواب بتا منفی"), {"test", "ruled_out"})
+        self.assertEqual(_keyword_categories("سلام"), set())
+
+    def test_import_maps_each_match_to_its_answer(self):
+        session = PregnancySession("pregnancy_test", gynecology_session_data={
+            "session_id": "patient_test",
+            "patient_answers": {
+                "q1": {"answer": "۳۰ سال"},
+                "q2": {"answer": "حالت تهوع صبحگاهی"},
+                "lmp_date": {"answer": "۱۴۰۳/۰۲/۰۱"},
+                "q4": "خستگی زیاد",
+            },
+        })
+        self.assertEqual(session.pregnancy_data.symptoms, ["حالت تهوع صبحگاهی", "خستگی زیاد"])
+        self.assertEqual(session.pregnancy_data.lmp, "۱۴۰۳/۰۲/۰۱")
+
+
+if __name__ == "__main__":
+    unittest.main()
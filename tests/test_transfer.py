@@ -0,0 +1,112 @@
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import transfer_to_pregnancy
+from app.core.gynecology_session import GynecologySession
+from transfer_to_pregnancy import (
+    _FOLD,
+    _PREGNANCY_KEYWORDS,
+    _PREGNANCY_MATCHER,
+    _trie_pattern,
+    check_pregnancy_suspicion,
+)
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _session_with(*answers) -> GynecologySession:
+    session = GynecologySession("patient_test", start_conversation=False)
+    session.patient_answers = {
+        f"q{i}": {"answer": answer, "timestamp": 0} for i, answer in enumerate(answers, 1)
+    }
+    return session
+
+
+class SuspicionTests(unittest.TestCase):
+    def test_no_answers(self):
+        self.assertFalse(check_pregnancy_suspicion(_session_with()))
+
+    def test_session_flag_short_circuits(self):
+        session = _session_with("سلام")
+        session.pregnancy_suspicion = True
+        self.assertTrue(check_pregnancy_suspicion(session))
+
+    def test_folds_arabic_letters_and_zwnj(self):
+        self.assertTrue(check_pregnancy_suspicion(_session_with("تست بارداري")))
+        self.assertTrue(check_pregnancy_suspicion(_session_with("حالت‌تهوع")))
+        self.assertFalse(check_pregnancy_suspicion(_session_with("درد کمر")))
+
+    def test_match_does_not_span_two_answers(self):
+        self.assertFalse(check_pregnancy_suspicion(_session_with("تاخیر", "قاعدگی")))
+
+
+class TriePatternTests(unittest.TestCase):
+    def test_matches_like_a_flat_alternation(self):
+        words = [k.translate(_FOLD) for k in _PREGNANCY_KEYWORDS]
+        flat = re.compile("|".join(map(re.escape, words)))
+        samples = words + [
+            "بیمار تاخیر پریود دارد", "تست بارداری منفی", "بارداری", "تاخیر", "حالت خوب", "",
+        ]
+        for text in samples:
+            self.assertEqual(
+                bool(_PREGNANCY_MATCHER.search(text)), bool(flat.search(text)), text
+            )
+
+    def test_handles_words_that_prefix_each_other(self):
+        pattern = re.compile(_trie_pattern(["ab", "abc", "b"]))
+        self.assertEqual(pattern.findall("abc ab b"), ["abc", "ab", "b"])
+
+    def test_escapes_metacharacters(self):
+        pattern = re.compile(_trie_pattern(["a.b", "a*"]))
+        self.assertIsNone(pattern.search("axb"))
+        self.assertEqual(pattern.findall("a.b a*"), ["a.b", "a*"])
+
+
+
+class MainTests(unittest.TestCase):
+    def test_missing_file_fails_before_loading_session_modules(self):
+        probe = (
+            "import sys, transfer_to_pregnancy as t\n"
+            "sys.argv = ['transfer_to_pregnancy.py', 'missing.json']\n"
+            "try:\n    t.main()\n"
+            "except SystemExit as e:\n"
+            "    print(e.code, 'app.core.gynecology_session' in sys.modules)\n"
+        )
+        result = subprocess.run(
+            [sys.executable, "-c", probe], cwd=ROOT, capture_output=True, text=True
+        )
+        self.assertEqual(result.stdout.splitlines()[-1], "1 False")
+        self.assertIn("missing.json", result.stdout)
+
+    def test_file_is_read_once_and_passed_on(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "patient.json")
+            with open(path, "wb") as f:
+                f.write(b"{}")
+            with mock.patch.object(transfer_to_pregnancy, "transfer_patient") as transfer, \
+                    mock.patch.object(sys, "argv", ["transfer_to_pregnancy.py", path]):
+                transfer_to_pregnancy.main()
+        transfer.assert_called_once_with(b"{}")
+
+    def test_later_missing_files_are_not_reported_as_the_input(self):
+        error = FileNotFoundError(2, "No such file", "data/sessions/other.json")
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "patient.json")
+            with open(path, "wb") as f:
+                f.write(b"{}")
+            with mock.patch.object(transfer_to_pregnancy, "transfer_patient", side_effect=error), \
+                    mock.patch.object(sys, "argv", ["transfer_to_pregnancy.py", path]), \
+                    mock.patch("builtins.print") as printed, \
+                    mock.patch("traceback.print_exc"):
+                transfer_to_pregnancy.main()
+        self.assertIn("خطای غیرمنتظره", printed.call_args_list[-1].args[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
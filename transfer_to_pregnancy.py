@@ -2,18 +2,81 @@
 Transfer to Pregnancy - اسکریپت انتقال بیمار به بخش بارداری
 """
 import sys
-import os
+import threading
+import re
 from pathlib import Path
+from typing import TYPE_CHECKING
 
 # اضافه کردن مسیر پروژه
 sys.path.insert(0, str(Path(__file__).parent))
 
-from app.core.gynecology_session import GynecologySession
-from app.core.pregnancy_session import PregnancySession
-from app.config.settings import OLLAMA_BASE_URL, SESSION_DIR
+if TYPE_CHECKING:
+    from app.core.gynecology_session import GynecologySession
 
 
-def check_pregnancy_suspicion(gyn_session: GynecologySession) -> bool:
+_PREGNANCY_KEYWORDS = (
+    "تاخیر قاعدگی",
+    "تاخیر پریود",
+    "تست بارداری",
+    "حالت تهوع",
+    "استفراغ صبح",
+    "پستان حساس",
+    "باردار",
+)
+# یکسان‌سازی نویسه‌ها: ی و ک عربی ← فارسی، نیم‌فاصله ← فاصله، ارقام فارسی/عربی ← لاتین
+_FOLD = str.maketrans({
+    "\u064A": "\u06CC",
+    "\u0643": "\u06A9",
+    "\u200C": " ",
+    **{chr(0x06F0 + i): str(i) for i in range(10)},
+    **{chr(0x0660 + i): str(i) for i in range(10)},
+})
+
+
+def _trie_pattern(words) -> str:
+    """
+    Regex for a set of literal words, factored by shared prefixes
+    ("تاخیر (?:پریود|قاعدگی)") so each position is tried against one
+    branch per distinct next character instead of every word.
+    """
+    trie: dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if "" in node:
+            return "(?:" + "|".join(branches) + ")?"
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return build(trie)
+
+
+# همه کلیدواژه‌ها در یک الگوی کامپایل‌شده؛ هر پاسخ فقط یک بار پیمایش می‌شود
+_PREGNANCY_MATCHER = re.compile(_trie_pattern(k.translate(_FOLD) for k in _PREGNANCY_KEYWORDS))
+
+_EXIT_COMMANDS = frozenset(("quit", "exit", "خروج", "done"))
+_REPORT_YES = frozenset(("y", "yes", "بله"))
+
+# بنرها یک بار ساخته می‌شوند و هر کدام با یک print چاپ می‌شوند
+_BAR = "=" * 60
+_HEADER_TRANSFER = f"\n{_BAR}\n🔄 سیستم انتقال به بخش بارداری\n{_BAR}\n\n"
+_HEADER_CONSULT = f"\n{_BAR}\n🤰 شروع مشاوره تخصصی بارداری\n{_BAR}\n\n"
+_HEADER_SUMMARY = f"\n{_BAR}\n📊 خلاصه جلسه بارداری\n{_BAR}\n"
+_HEADER_REPORT = f"\n{_BAR}\n📄 گزارش نهایی بارداری\n{_BAR}\n"
+
+
+def _extract(answer_data) -> str:
+    # answers are plain dicts loaded from JSON; an exact type check skips the MRO walk
+    return answer_data.get("answer", "") if type(answer_data) is dict else str(answer_data)
+
+
+def check_pregnancy_suspicion(gyn_session: "GynecologySession") -> bool:
     """
     بررسی مشکوک به بارداری بودن
     
@@ -26,41 +89,49 @@ def check_pregnancy_suspicion(gyn_session: GynecologySession) -> bool:
     # روش ۱: چک کردن پرچم خود جلسه
     if gyn_session.pregnancy_suspicion:
         return True
-    
-    # روش ۲: تحلیل پاسخ‌های بیمار
-    pregnancy_keywords = [
-        "تاخیر قاعدگی",
-        "تاخیر پریود", 
-        "تست بارداری",
-        "حالت تهوع",
-        "استفراغ صبح",
-        "پستان حساس",
-        "باردار"
-    ]
-    
-    for answer_data in gyn_session.patient_answers.values():
-        answer = answer_data.get("answer", "") if isinstance(answer_data, dict) else str(answer_data)
-        
-        if any(keyword in answer for keyword in pregnancy_keywords):
-            return True
-    
-    return False
 
+    answers = gyn_session.patient_answers
+    if not answers:
+        return False
 
-def transfer_patient(gyn_session_file: str) -> None:
+    # روش ۲: تحلیل پاسخ‌های بیمار - یک جستجو روی همه پاسخ‌ها به هم چسبیده
+    # (کلیدواژه‌ها شامل خط جدید نیستند، پس تطابقی از مرز دو پاسخ عبور نمی‌کند)
+    blob = "\n".join(map(_extract, answers.values())).translate(_FOLD)
+    return _PREGNANCY_MATCHER.search(blob) is not None
+
+
+def transfer_patient(gyn_session_raw: bytes) -> None:
     """
     انتقال بیمار از بخش زنان به بخش بارداری
     
     Args:
-        gyn_session_file: مسیر فایل جلسه زنان
+        gyn_session_raw: محتوای فایل جلسه زنان (JSON)
     """
-    print("\n" + "="*60)
-    print("🔄 سیستم انتقال به بخش بارداری")
-    print("="*60 + "\n")
+    # ماژول‌های جلسه فقط اینجا بارگذاری می‌شوند تا خطاهای آرگومان در main فوری باشند
+    from app.core.gynecology_session import GynecologySession
+    from app.core.pregnancy_session import PregnancySession
+    from app.config.settings import OLLAMA_BASE_URL, SESSION_DIR
+    from app.core.ollama_client import get_http_session
+    import orjson
+    import requests
+
+    def warm_connection() -> None:
+        # اتصال keep-alive به Ollama را از قبل باز می‌کند تا start() منتظر آن نماند
+        try:
+            get_http_session().get(f"{OLLAMA_BASE_URL}/api/tags", timeout=5)
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️  اتصال به Ollama برقرار نشد: {e}")
+
+    print(_HEADER_TRANSFER, end="")
     
     # بارگذاری جلسه زنان
     print("📂 در حال بارگذاری جلسه زنان...")
-    gyn_session = GynecologySession.load_from_file(gyn_session_file, OLLAMA_BASE_URL)
+    gyn_session = GynecologySession.from_dict(orjson.loads(gyn_session_raw), OLLAMA_BASE_URL)
+
+    # فقط پس از بارگذاری موفق؛ گرم شدن اتصال با بررسی علائم، تایید کاربر
+    # و ساخت جلسه بارداری هم‌پوشانی دارد و پیش از start() منتظر آن می‌مانیم
+    warmup = threading.Thread(target=warm_connection, daemon=True)
+    warmup.start()
     
     print(f"✅ جلسه بارگذاری شد: {gyn_session.session_id}")
     print(f"   - تعداد پاسخ‌ها: {len(gyn_session.patient_answers)}")
@@ -75,7 +146,7 @@ def transfer_patient(gyn_session_file: str) -> None:
         # تایید از کاربر
         confirm = input("\nآیا می‌خواهید بیمار را به بخش بارداری منتقل کنید؟ (y/n): ")
         
-        if confirm.lower() not in ['y', 'yes', 'بله']:
+        if confirm.strip().lower() not in _REPORT_YES:
             print("❌ انتقال لغو شد.")
             return
         
@@ -85,36 +156,45 @@ def transfer_patient(gyn_session_file: str) -> None:
         pregnancy_session = PregnancySession(
             session_id=f"pregnancy_{gyn_session.session_id}",
             gynecology_session_data=gyn_session.to_dict(),
-            ollama_base_url=OLLAMA_BASE_URL,
-            pregnancy_model="deepseek-r1:1.5b"
+            ollama_base_url=OLLAMA_BASE_URL
         )
         
         print("✅ جلسه بارداری ایجاد شد")
         
         # شروع مشاوره بارداری
-        print("\n" + "="*60)
-        print("🤰 شروع مشاوره تخصصی بارداری")
-        print("="*60 + "\n")
+        print(_HEADER_CONSULT, end="")
         
-        first_question = pregnancy_session.start_pregnancy_consultation()
+        warmup.join()
+        first_question = pregnancy_session.start()
         print(f"پزشک: {first_question}\n")
         
         # حلقه تعاملی
         question_count = 0
-        while pregnancy_session.status.value != "confirmed" and question_count < 20:
-            answer = input("بیمار: ").strip()
-            
-            if answer.lower() in ['quit', 'exit', 'خروج', 'done']:
+        submit = pregnancy_session.submit_answer
+        status = pregnancy_session.status
+        _write, _flush, _readline = sys.stdout.write, sys.stdout.flush, sys.stdin.readline
+        while status.value != "confirmed" and question_count < 20:
+            _write("بیمار: ")
+            _flush()
+            line = _readline()
+            if not line:  # EOF (پایان ورودی pipe)
                 break
+            answer = line.strip()
             
             if not answer:
                 continue
             
-            next_question = pregnancy_session.submit_answer(answer)
+            if answer.lower() in _EXIT_COMMANDS:
+                break
+            
+            next_question = submit(answer)
+            status = pregnancy_session.status
             
             if next_question:
                 print(f"\nپزشک: {next_question}\n")
                 question_count += 1
+                # سوال چاپ شده؛ خلاصه‌سازی تاریخچه تا پاسخ بعدی بیمار انجام می‌شود
+                pregnancy_session.condense_if_needed()
             else:
                 print("❌ خطا در دریافت سوال بعدی")
                 break
@@ -123,9 +203,7 @@ def transfer_patient(gyn_session_file: str) -> None:
         pregnancy_file = SESSION_DIR / f"{pregnancy_session.session_id}.json"
         pregnancy_session.save_to_file(str(pregnancy_file))
         
-        print("\n" + "="*60)
-        print("📊 خلاصه جلسه بارداری")
-        print("="*60)
+        print(_HEADER_SUMMARY, end="")
         print(f"Session ID: {pregnancy_session.session_id}")
         print(f"وضعیت: {pregnancy_session.status.value}")
         print(f"تعداد سوالات: {question_count}")
@@ -134,12 +212,12 @@ def transfer_patient(gyn_session_file: str) -> None:
         print(f"\n💾 گزارش ذخیره شد: {pregnancy_file}")
         
         # تولید گزارش نهایی
-        print("\n📋 آیا می‌خواهید گزارش نهایی تولید شود؟ (y/n): ", end="")
-        if input().lower() in ['y', 'yes', 'بله']:
+        _write("\n📋 آیا می‌خواهید گزارش نهایی تولید شود؟ (y/n): ")
+        _flush()
+        # stdin ممکن است در حلقه به EOF رسیده باشد؛ readline آنجا "" (یعنی خیر) برمی‌گرداند
+        if _readline().strip().lower() in _REPORT_YES:
             report = pregnancy_session.generate_pregnancy_report()
-            print("\n" + "="*60)
-            print("📄 گزارش نهایی بارداری")
-            print("="*60)
+            print(_HEADER_REPORT, end="")
             print(report.get('final_summary', 'خطا در تولید گزارش'))
     
     else:
@@ -157,15 +235,18 @@ def main():
         print(f"  python {sys.argv[0]} data/sessions/patient_001.json")
         sys.exit(1)
     
-    gyn_file = sys.argv[1]
+    gyn_path = Path(sys.argv[1])
     
-    # بررسی وجود فایل
-    if not os.path.exists(gyn_file):
-        print(f"❌ خطا: فایل {gyn_file} یافت نشد")
+    # فایل همین‌جا و فقط یک بار خوانده می‌شود (بدون stat جداگانه)، پیش از بارگذاری
+    # ماژول‌های جلسه؛ پس خطای نبود فایل فوری است و با خطاهای بعدی اشتباه نمی‌شود
+    try:
+        raw = gyn_path.read_bytes()
+    except FileNotFoundError:
+        print(f"❌ خطا: فایل {gyn_path} یافت نشد")
         sys.exit(1)
     
     try:
-        transfer_patient(gyn_file)
+        transfer_patient(raw)
     except KeyboardInterrupt:
         print("\n\n⚠️  عملیات توسط کاربر لغو شد")
     except Exception as e: